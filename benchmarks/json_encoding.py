@@ -0,0 +1,65 @@
+"""
+Benchmark of JSON encoding backends on realistic message pages.
+Compares `shmelegram.utils.encoding` stdlib and orjson backends, both
+encoding (`dumps`) and decoding (`loads`) of `ChatMessagesApi` response pages.
+
+Usage:
+    FLASK_TESTING=True python -m benchmarks.json_encoding [--pages 2000] [--page-size 50]
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from shmelegram.utils import encoding
+
+
+def make_page(page_size: int) -> dict:
+    """Return response dict shaped as `ChatMessagesApi.get` output"""
+    start = datetime(2022, 1, 1, 12, 30, 15, 123456)
+    return {'messages': [{
+        'id': i, 'chat': 1, 'from_user': i % 50 + 1, 'is_service': False,
+        'text': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit',
+        'reply_to': None if i % 5 else i - 1,
+        'created_at': start + timedelta(seconds=i),
+        'edited_at': None if i % 7 else start + timedelta(seconds=i, minutes=1),
+        'seen_by': list(range(1, i % 20 + 2)),
+    } for i in range(page_size)]}
+
+
+def run(backend: str, page: dict, pages: int) -> tuple[float, float, int]:
+    """
+    Encode and decode `page` `pages` times with given backend.
+
+    Returns:
+        tuple[float, float, int]: encoded pages/s, decoded pages/s, page size in bytes
+    """
+    encoding.configure(backend)
+    encoded = encoding.dumps(page)
+    start = time.perf_counter()
+    for _ in range(pages):
+        encoding.dumps(page)
+    dumps_rate = pages / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for _ in range(pages):
+        encoding.loads(encoded)
+    loads_rate = pages / (time.perf_counter() - start)
+    return dumps_rate, loads_rate, len(encoded.encode('utf-8'))
+
+
+def main():
+    """Run benchmark and print results table"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--pages', type=int, default=2000)
+    parser.add_argument('--page-size', type=int, default=50)
+    args = parser.parse_args()
+    page = make_page(args.page_size)
+    backends = ['stdlib'] + (['orjson'] if encoding.orjson is not None else [])
+    print(f'{"backend":<10}{"bytes/page":>12}{"dumps pages/s":>16}{"loads pages/s":>16}')
+    for backend in backends:
+        dumps_rate, loads_rate, size = run(backend, page, args.pages)
+        print(f'{backend:<10}{size:>12}{dumps_rate:>16.0f}{loads_rate:>16.0f}')
+
+
+if __name__ == '__main__':
+    main()
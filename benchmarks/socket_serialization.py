@@ -0,0 +1,102 @@
+"""
+Benchmark of Socket.IO broadcast serialization.
+Compares bytes and CPU time per broadcasted message for:
+    - JSON packets encoded per recipient (`socketio.BaseManager`);
+    - JSON packets encoded once per room (`PreEncodedManager`);
+    - MessagePack packets encoded once per room (`PreEncodedManager`).
+
+Usage:
+    FLASK_TESTING=True python -m benchmarks.socket_serialization [--members 50] [--messages 2000]
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from socketio import BaseManager, packet
+from socketio.msgpack_packet import MsgPackPacket
+
+from shmelegram.utils.broadcast import PreEncodedManager
+
+
+class FakeEngineIO:
+    """Engine.IO stand-in counting sent frames and bytes"""
+
+    def __init__(self):
+        self.frames = self.bytes = 0
+
+    def send(self, eio_sid, data):
+        # pylint: disable=unused-argument
+        self.frames += 1
+        self.bytes += len(data.encode('utf-8') if isinstance(data, str) else data)
+
+
+class FakeServer:
+    """Socket.IO server stand-in with configurable packet class"""
+
+    def __init__(self, packet_class):
+        self.packet_class = packet_class
+        self.eio = FakeEngineIO()
+
+    def _emit_internal(self, eio_sid, event, data, namespace=None, id=None):
+        # pylint: disable=redefined-builtin
+        # same as `socketio.Server._emit_internal`
+        data = [data] if data is not None else []
+        self._send_packet(eio_sid, self.packet_class(
+            packet.EVENT, namespace=namespace, data=[event] + data, id=id
+        ))
+
+    def _send_packet(self, eio_sid, pkt):
+        # same as `socketio.Server._send_packet`
+        self.eio.send(eio_sid, pkt.encode())
+
+
+def make_message(id_: int) -> dict:
+    """Return message json dict shaped as `MessageService.to_json` output"""
+    created_at = datetime(2022, 1, 1) + timedelta(seconds=id_)
+    return {
+        'id': id_, 'chat': 1, 'from_user': id_ % 50 + 1, 'is_service': False,
+        'text': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit ' * 2,
+        'reply_to': None, 'created_at': created_at.isoformat(),
+        'edited_at': None, 'seen_by': [id_ % 50 + 1],
+    }
+
+
+def run(manager_class, packet_class, members: int, messages: int) -> tuple[float, float]:
+    """
+    Broadcast `messages` messages to room of `members` participants.
+
+    Returns:
+        tuple[float, float]: bytes per message frame and CPU microseconds per broadcast
+    """
+    server = FakeServer(packet_class)
+    manager = manager_class()
+    manager.set_server(server)
+    for i in range(members):
+        manager.enter_room(f'sid{i}', '/', 1, eio_sid=f'eio{i}')
+    payloads = [make_message(i) for i in range(messages)]
+    start = time.process_time()
+    for payload in payloads:
+        manager.emit('message', payload, '/', room=1)
+    elapsed = time.process_time() - start
+    return server.eio.bytes / server.eio.frames, elapsed / messages * 1e6
+
+
+def main():
+    """Run benchmark and print results table"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--members', type=int, default=50)
+    parser.add_argument('--messages', type=int, default=2000)
+    args = parser.parse_args()
+    print(f'{"variant":<28}{"bytes/frame":>12}{"us/broadcast":>14}')
+    for name, manager_class, packet_class in (
+        ('json, per recipient', BaseManager, packet.Packet),
+        ('json, pre-encoded', PreEncodedManager, packet.Packet),
+        ('msgpack, pre-encoded', PreEncodedManager, MsgPackPacket),
+    ):
+        size, cpu = run(manager_class, packet_class, args.members, args.messages)
+        print(f'{name:<28}{size:>12.1f}{cpu:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,55 +1,76 @@
-"""
-Initializing file containing Flask, sqlalchemy, socketio, flask_migrate and flask_restful instances.
-"""
-
-# pylint: disable=wrong-import-position
-import os
-
-import eventlet
-from flask import Flask
-from flask_migrate import Migrate
-from flask_restful import Api
-from flask_socketio import SocketIO
-from flask_sqlalchemy import SQLAlchemy
-
-from shmelegram.utils.redis_client import RedisClient, FakeRedisClient
-from shmelegram.config import BaseConfig, TestConfig, Config
-
-eventlet.monkey_patch()
-
-app = Flask(__name__, instance_relative_config=False)
-app.config.from_object(TestConfig if BaseConfig.TESTING else Config)
-
-db = SQLAlchemy(app, session_options={'autocommit': True})
-migrate = Migrate(app, db, directory=BaseConfig.MIGRATION_DIR)
-redis_client = RedisClient.from_url(
-    app.config['REDIS_URL'], decode_responses=True
-) if not app.config['TESTING'] else FakeRedisClient(app.config['REDIS_URL'])
-
-socketio = SocketIO(app, engineio_logger=True, logger=True)
-
-api = Api()
-
-os.makedirs(app.instance_path, exist_ok=True)
-
-
-from .models import Chat, Message, User
-from .rest_api import bp as rest_bp
-from .rest_api import chat as chat_api
-from .rest_api import message as message_api
-from .rest_api import user as user_api
-from .views import auth, chat, home, messaging
-
-api.init_app(rest_bp)
-
-app.register_blueprint(chat.bp)
-app.register_blueprint(home.bp)
-app.register_blueprint(auth.bp)
-app.register_blueprint(rest_bp)
-
-
-@app.after_request
-def flush_db(request):
-    """Flush db on end of each flask request, no matter what errors occurred"""
-    db.session.flush()
-    return request
+"""
+Initializing file containing Flask, sqlalchemy, socketio, flask_migrate and flask_restful instances.
+"""
+
+# pylint: disable=wrong-import-position
+import os
+
+import eventlet
+from flask import Flask
+from flask_migrate import Migrate
+from flask_restful import Api
+from flask_socketio import SocketIO
+from flask_sqlalchemy import SQLAlchemy
+
+from shmelegram.utils import encoding
+from shmelegram.utils.broadcast import PreEncodedManager
+from shmelegram.utils.coalescer import EventCoalescer
+from shmelegram.utils.connections import ConnectionRegistry
+from shmelegram.utils.jobs import JobRunner
+from shmelegram.utils.redis_client import RedisClient, FakeRedisClient
+from shmelegram.config import BaseConfig, TestConfig, Config
+
+eventlet.monkey_patch()
+
+app = Flask(__name__, instance_relative_config=False)
+app.config.from_object(TestConfig if BaseConfig.TESTING else Config)
+encoding.configure(app.config['JSON_BACKEND'])
+app.json_encoder = encoding.JSONEncoder
+
+db = SQLAlchemy(app, session_options={'autocommit': True})
+migrate = Migrate(app, db, directory=BaseConfig.MIGRATION_DIR)
+redis_client = RedisClient.from_url(
+    app.config['REDIS_URL'], decode_responses=True
+) if not app.config['TESTING'] else FakeRedisClient(app.config['REDIS_URL'])
+
+socketio = SocketIO(
+    app, engineio_logger=True, logger=True,
+    serializer=(
+        encoding.MsgPackPacket if app.config['SOCKETIO_SERIALIZER'] == 'msgpack'
+        else app.config['SOCKETIO_SERIALIZER']
+    ), json=encoding, client_manager=PreEncodedManager()
+)
+event_coalescer = EventCoalescer(socketio, app)
+job_runner = JobRunner(socketio, app)
+connections = ConnectionRegistry(redis_client, socketio, app)
+
+api = Api()
+api.representations['application/json'] = encoding.output_json
+
+os.makedirs(app.instance_path, exist_ok=True)
+
+
+from .models import Chat, Message, User
+from .purge import ChatPurger
+
+chat_purger = ChatPurger(socketio, app)
+
+from .rest_api import bp as rest_bp
+from .rest_api import chat as chat_api
+from .rest_api import message as message_api
+from .rest_api import user as user_api
+from .views import auth, chat, home, messaging
+
+api.init_app(rest_bp)
+
+app.register_blueprint(chat.bp)
+app.register_blueprint(home.bp)
+app.register_blueprint(auth.bp)
+app.register_blueprint(rest_bp)
+
+
+@app.after_request
+def flush_db(request):
+    """Flush db on end of each flask request, no matter what errors occurred"""
+    db.session.flush()
+    return request
@@ -1,71 +1,106 @@
-"""
-This module contains config data for project
-Defines following classes:
-    - `BaseConfig`, base class for config classes
-    - `Config`, production config
-    - `TestConfig`, testing config
-    - `ChatKind`, chat kinds enumeration
-"""
-
-# pylint: disable=too-few-public-methods
-
-from os import getenv, urandom
-from enum import IntEnum
-
-from dotenv import load_dotenv
-
-load_dotenv()
-
-
-class BaseConfig:
-    """Base config class"""
-
-    DEBUG = True
-    MIGRATION_DIR = 'shmelegram/migrations'
-    TESTING = getenv('FLASK_TESTING', '').strip() == 'True'
-    SECRET_KEY = urandom(32)
-    API_RESPONSE_SIZE = 50
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
-
-
-class Config(BaseConfig):
-    """Production config class"""
-
-    SQLALCHEMY_DATABASE_URI = 'mysql+mysqlconnector://{}:{}@{}/{}'.format(
-        getenv('MYSQL_USER'), getenv('MYSQL_PASSWORD'),
-        getenv('MYSQL_SERVER'), getenv('MYSQL_DATABASE')
-    )
-    REDIS_URL = 'redis://{}:{}@{}:{}/{}'.format(
-        getenv('REDIS_USER'), getenv('REDIS_PASSWORD'),
-        getenv('REDIS_HOST'), getenv('REDIS_PORT'),
-        int(getenv('REDIS_DATABASE_NUMBER', '0'))
-    )
-    REDIS_MESSAGE_QUEUE_URL = 'redis://{}:{}@{}:{}/{}'.format(
-        getenv('REDIS_USER'), getenv('REDIS_PASSWORD'),
-        getenv('REDIS_HOST'), getenv('REDIS_PORT'),
-        int(getenv('REDIS_MESSAGE_QUEUE_DATABASE_NUMBER', '1'))
-    )
-
-
-class TestConfig(BaseConfig):
-    """Testing config class"""
-
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
-    REDIS_URL = 'redis://@localhost:6379/0'
-    REDIS_MESSAGE_QUEUE_URL = 'redis://@localhost:6379/1'
-
-
-
-class ChatKind(IntEnum):
-    """
-    Enumeration of chat types.
-    The value of chat type is the max number of members
-        the chat can hold.
-
-    Attributes:
-        GROUP (int): group chat type
-        PRIVATE (int): private chat type
-    """
-
-    PRIVATE = 2
-    GROUP = 50
+"""
+This module contains config data for project
+Defines following classes:
+    - `BaseConfig`, base class for config classes
+    - `Config`, production config
+    - `TestConfig`, testing config
+    - `ChatKind`, chat kinds enumeration
+"""
+
+# pylint: disable=too-few-public-methods
+
+from os import getenv, urandom
+from enum import IntEnum
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class BaseConfig:
+    """Base config class"""
+
+    DEBUG = True
+    MIGRATION_DIR = 'shmelegram/migrations'
+    TESTING = getenv('FLASK_TESTING', '').strip() == 'True'
+    SECRET_KEY = urandom(32)
+    API_RESPONSE_SIZE = 50
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # 'default' for JSON text packets, 'msgpack' for binary packets
+    SOCKETIO_SERIALIZER = getenv('SOCKETIO_SERIALIZER', 'default').strip() or 'default'
+    # 'auto' uses orjson if it is installed, otherwise 'stdlib'
+    JSON_BACKEND = getenv('JSON_BACKEND', 'auto').strip() or 'auto'
+    # outbound room events buffering window (ms), 0 disables coalescing
+    EVENT_COALESCE_WINDOW = float(getenv('EVENT_COALESCE_WINDOW', '0'))
+    EVENT_COALESCE_MAX_BATCH = int(getenv('EVENT_COALESCE_MAX_BATCH', '100'))
+    # per-user update log retention (s), max updates per request
+    #   and max long-polling timeout (s)
+    UPDATE_LOG_RETENTION = int(getenv('UPDATE_LOG_RETENTION', str(7 * 24 * 3600)))
+    UPDATES_LIMIT = 100
+    UPDATES_MAX_TIMEOUT = 50
+    UPDATES_POLL_INTERVAL = 0.5
+    # max number of messages deleted in one batch when purging deleted chats
+    CHAT_PURGE_BATCH_SIZE = int(getenv('CHAT_PURGE_BATCH_SIZE', '500'))
+    # background jobs: 'redis' or 'memory' backend, number of workers
+    #   started in the web process (0 to run them only with 'flask jobs work')
+    JOBS_BACKEND = getenv('JOBS_BACKEND', 'redis').strip() or 'redis'
+    JOBS_WORKERS = int(getenv('JOBS_WORKERS', '1'))
+    JOBS_MAX_RETRIES = int(getenv('JOBS_MAX_RETRIES', '3'))
+    JOBS_RETRY_BACKOFF = float(getenv('JOBS_RETRY_BACKOFF', '1'))
+    JOBS_POLL_INTERVAL = 1.0
+    # Socket.IO connection registry: node id (defaults to hostname, pid and
+    #   random suffix), TTL (s) of connection keys refreshed by heartbeats
+    NODE_ID = getenv('NODE_ID', '').strip() or None
+    CONNECTION_TTL = int(getenv('CONNECTION_TTL', '120'))
+    REDIS_KEY_PREFIX = getenv('REDIS_KEY_PREFIX', 'shmelegram:')
+
+
+class Config(BaseConfig):
+    """Production config class"""
+
+    SQLALCHEMY_DATABASE_URI = 'mysql+mysqlconnector://{}:{}@{}/{}'.format(
+        getenv('MYSQL_USER'), getenv('MYSQL_PASSWORD'),
+        getenv('MYSQL_SERVER'), getenv('MYSQL_DATABASE')
+    )
+    REDIS_URL = 'redis://{}:{}@{}:{}/{}'.format(
+        getenv('REDIS_USER'), getenv('REDIS_PASSWORD'),
+        getenv('REDIS_HOST'), getenv('REDIS_PORT'),
+        int(getenv('REDIS_DATABASE_NUMBER', '0'))
+    )
+    REDIS_MESSAGE_QUEUE_URL = 'redis://{}:{}@{}:{}/{}'.format(
+        getenv('REDIS_USER'), getenv('REDIS_PASSWORD'),
+        getenv('REDIS_HOST'), getenv('REDIS_PORT'),
+        int(getenv('REDIS_MESSAGE_QUEUE_DATABASE_NUMBER', '1'))
+    )
+    JOBS_REDIS_URL = 'redis://{}:{}@{}:{}/{}'.format(
+        getenv('REDIS_USER'), getenv('REDIS_PASSWORD'),
+        getenv('REDIS_HOST'), getenv('REDIS_PORT'),
+        int(getenv('REDIS_JOBS_DATABASE_NUMBER', '2'))
+    )
+
+
+class TestConfig(BaseConfig):
+    """Testing config class"""
+
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    REDIS_URL = 'redis://@localhost:6379/0'
+    REDIS_MESSAGE_QUEUE_URL = 'redis://@localhost:6379/1'
+    JOBS_REDIS_URL = 'redis://@localhost:6379/2'
+    JOBS_BACKEND = 'memory'
+    JOBS_WORKERS = 0
+
+
+
+class ChatKind(IntEnum):
+    """
+    Enumeration of chat types.
+    The value of chat type is the max number of members
+        the chat can hold.
+
+    Attributes:
+        GROUP (int): group chat type
+        PRIVATE (int): private chat type
+    """
+
+    PRIVATE = 2
+    GROUP = 50
@@ -4,7 +4,8 @@ following classes:
     - `ModelMixin`, base model mixin used in every other model;
     - `User`, user model;
     - `Chat`, chat model;
-    - `Message`, message model.
+    - `Message`, message model;
+    - `UserUpdate`, user update log entry model.
 """
 
 
@@ -16,7 +17,7 @@ from typing import Any, NoReturn, Optional, TypeVar, Type, Union
 
 from sqlalchemy import (
     Table, Column, Integer, ForeignKey, DateTime,
-    String, Enum, Boolean, desc, event
+    String, Text, Enum, Boolean, Index, desc, event
 )
 from sqlalchemy.engine import Engine
 from sqlalchemy.ext.hybrid import hybrid_method, hybrid_property
@@ -390,6 +391,8 @@ class Message(db.Model, ModelMixin):
 class Chat(db.Model, ModelMixin):
     """
     Model representing chat.
+    Deleted chats are kept as tombstones (see `mark_deleted`) until their
+        messages are purged in background, and are not retrieved by class methods.
 
     Arguments:
         kind (ChatKind): type of chat
@@ -403,6 +406,7 @@ class Chat(db.Model, ModelMixin):
     id = Column(Integer, primary_key=True)
     kind = Column(Enum(ChatKind))
     title = Column(String(50), nullable=True)
+    deleted_at = Column(DateTime(), nullable=True, default=None, index=True)
 
     members = relationship(
         'User', secondary=chat_membership, passive_deletes=True,
@@ -421,6 +425,84 @@ class Chat(db.Model, ModelMixin):
             raise ValueError('unable to create non-private chat without title')
         super().__init__(kind=kind, title=title)
 
+    @classmethod
+    def exists(cls, id_: ModelId) -> bool:
+        """
+        Check if chat with this id exists and is not deleted.
+
+        Args:
+            id_ (int)
+
+        Returns:
+            bool
+        """
+        return db.session.query(
+            cls.query.filter(cls.id == id_, cls.deleted_at.is_(None)).exists()
+        ).scalar()
+
+    @classmethod
+    def get(cls, id_: ModelId) -> Chat:
+        """
+        Get not deleted chat by some id
+
+        Args:
+            id_ (int): id of chat to be retrieved
+
+        Raises:
+            ValueError: if chat with such id does not exist or is deleted.
+
+        Returns:
+            Chat
+        """
+        chat = cls.get_or_none(id_)
+        if chat is None:
+            raise ValueError(f'{cls.__name__} with id {id_} does not exist')
+        return chat
+
+    @classmethod
+    def get_or_none(cls, id_: ModelId) -> Optional[Chat]:
+        """
+        Get not deleted chat by some id. If this id does not exist, return None
+
+        Args:
+            id_ (int): id of chat to be retrieved
+
+        Returns:
+            Optional[Chat]
+        """
+        chat = cls.query.get(id_)
+        if chat is None or chat.is_deleted:
+            return None
+        return chat
+
+    @hybrid_property
+    def is_deleted(self) -> bool:
+        """
+        Whether chat is deleted and waits for purging.
+
+        Returns:
+            bool
+        """
+        return self.deleted_at is not None
+
+    @is_deleted.expression
+    def is_deleted(cls):
+        # pylint: disable=no-self-argument
+        return cls.deleted_at.isnot(None)
+
+    def mark_deleted(self) -> NoReturn:
+        """
+        Mark chat as deleted and remove all its members.
+        Unlike `delete`, messages are not loaded and deleted,
+            they are expected to be purged in background in batches.
+
+        Returns:
+            NoReturn
+        """
+        self.deleted_at = dt.utcnow()
+        self.members = []
+        self.save()
+
     @validates('members')
     def validate_member(self, key: str, user: User) -> User:
         """
@@ -545,7 +627,9 @@ class Chat(db.Model, ModelMixin):
         Returns:
             Chat
         """
-        chat = cls.query.filter(cls.title == title).first()
+        chat = cls.query.filter(
+            cls.title == title, cls.deleted_at.is_(None)
+        ).first()
         if chat is None:
             raise ValueError(
                 f'{cls.__name__} with title {title!r} does not exist'
@@ -566,7 +650,7 @@ class Chat(db.Model, ModelMixin):
             Union[flask_sqlalchemy.BaseQuery, list[Chat]]
         """
         chats = cls.query.filter(
-            cls.title.startswith(name)
+            cls.title.startswith(name), cls.deleted_at.is_(None)
         )
         if not query:
             chats = chats.all()
@@ -576,3 +660,38 @@ class Chat(db.Model, ModelMixin):
         return self.__class__.__name__ + (
             f"(id={self.id}, kind={self.kind.name})"
         )
+
+
+class UserUpdate(db.Model, ModelMixin):
+    """
+    Model representing entry of per-user append-only update log.
+    Every server-to-client event is recorded for each of its recipients,
+        so clients can fetch events they missed while being offline.
+    Id of the entry is used as update offset.
+
+    Arguments:
+        user (User): recipient user
+        event (str): event name
+        payload (str): JSON encoded event data
+        created_at (datetime, optional), defaults to `datetime.utcnow()`
+    """
+    __tablename__ = 'user_update'
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(
+        Integer, ForeignKey('user.id', ondelete="CASCADE"), nullable=False
+    )
+    event = Column(String(32), nullable=False)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime(), default=dt.utcnow, nullable=False, index=True)
+
+    user = relationship('User', uselist=False)
+
+    __table_args__ = (
+        Index('ix_user_update_user_id_id', 'user_id', 'id'),
+    )
+
+    def __repr__(self) -> str:
+        return self.__class__.__name__ + (
+            f"(id={self.id}, user_id={self.user_id}, event={self.event!r})"
+        )
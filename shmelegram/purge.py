@@ -0,0 +1,161 @@
+"""
+This module provides background purging of deleted chats.
+Deleted chats are tombstones (see `Chat.mark_deleted`), whose messages
+    and views are deleted in bounded batches, so deleting a large chat never
+    loads its messages into memory or blocks the event loop.
+Defines following classes:
+    - `ChatPurger`
+
+Defines following functions:
+    - `purge_chats_job`, 'purge_chats' background job
+    - `purge_chats_command`, 'flask purge-chats' command
+"""
+
+import time
+from typing import Any, Callable, NoReturn, Optional
+
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+from flask_socketio import SocketIO
+
+from shmelegram import job_runner
+from shmelegram.service import ChatService
+
+
+JsonDict = dict[str, Any]
+
+
+class ChatPurger:
+    """
+    Purges deleted chats.
+    `schedule` enqueues 'purge_chats' background job (see `JobRunner`),
+        which purges every deleted chat. Batches are separated by a cooperative
+        yield, so other greenlets run in between.
+
+    Config values:
+        CHAT_PURGE_BATCH_SIZE (int): max number of messages deleted in one batch
+    """
+
+    def __init__(self, socketio: SocketIO, app: Optional[Flask] = None):
+        self.socketio = socketio
+        self.app = None
+        self.batch_size = 500
+        self.stats = {
+            'chats': 0, 'messages': 0, 'views': 0, 'batches': 0, 'seconds': 0.0
+        }
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> NoReturn:
+        """
+        Read purging settings from app config and register cli command.
+
+        Args:
+            app (Flask)
+
+        Returns:
+            NoReturn
+        """
+        self.app = app
+        self.batch_size = max(1, app.config['CHAT_PURGE_BATCH_SIZE'])
+        app.extensions['chat_purger'] = self
+        app.cli.add_command(purge_chats_command)
+
+    def schedule(self) -> NoReturn:
+        """
+        Enqueue 'purge_chats' background job.
+
+        Returns:
+            NoReturn
+        """
+        job_runner.enqueue('purge_chats')
+
+    def run(self, progress: Optional[Callable[[int, JsonDict], Any]] = None) -> int:
+        """
+        Purge every deleted chat. Requires app context.
+
+        Args:
+            progress (Optional[Callable[[int, JsonDict], Any]], optional): called
+                after every batch with chat id and the batch stats. Defaults to None.
+
+        Returns:
+            int: number of purged chats
+        """
+        purged = 0
+        for chat_id in ChatService.get_deleted_ids():
+            self.purge(chat_id, progress)
+            purged += 1
+        return purged
+
+    def purge(
+        self, chat_id: int, progress: Optional[Callable[[int, JsonDict], Any]] = None
+    ) -> JsonDict:
+        """
+        Purge deleted chat. Requires app context.
+
+        Args:
+            chat_id (int): id of deleted chat
+            progress (Optional[Callable[[int, JsonDict], Any]], optional): called
+                after every batch with chat id and the batch stats. Defaults to None.
+
+        Returns:
+            JsonDict: {'messages': int, 'views': int, 'batches': int, 'seconds': float}
+        """
+        started_at = time.monotonic()
+        result = {'messages': 0, 'views': 0, 'batches': 0, 'seconds': 0.0}
+        for message_count, view_count in ChatService.purge_chat(chat_id, self.batch_size):
+            result['messages'] += message_count
+            result['views'] += view_count
+            result['batches'] += 1
+            if progress is not None:
+                progress(chat_id, {'messages': message_count, 'views': view_count})
+            self.socketio.sleep(0)
+        result['seconds'] = time.monotonic() - started_at
+        for key, value in result.items():
+            self.stats[key] += value
+        self.stats['chats'] += 1
+        current_app.logger.info(
+            'purged chat %s: %s messages, %s views in %s batches, %.3fs',
+            chat_id, result['messages'], result['views'],
+            result['batches'], result['seconds']
+        )
+        return result
+
+    def status(self) -> JsonDict:
+        """
+        Get purging backlog and stats of this process. Requires app context.
+
+        Returns:
+            JsonDict: {'backlog': JsonDict, 'stats': JsonDict},
+                see `ChatService.get_purge_backlog`
+        """
+        return {
+            'backlog': ChatService.get_purge_backlog(),
+            'stats': dict(self.stats)
+        }
+
+
+@job_runner.task('purge_chats')
+def purge_chats_job():
+    """Purge every deleted chat."""
+    current_app.extensions['chat_purger'].run()
+
+
+@click.command('purge-chats')
+@click.option('--status', is_flag=True, help='Show purging backlog only.')
+@with_appcontext
+def purge_chats_command(status: bool):
+    """Purge messages of deleted chats."""
+    purger: ChatPurger = current_app.extensions['chat_purger']
+    backlog = ChatService.get_purge_backlog()
+    click.echo(f"{backlog['chats']} deleted chats, {backlog['messages']} messages to purge")
+    if status:
+        return
+    purged = purger.run(progress=lambda chat_id, batch: click.echo(
+        f"chat {chat_id}: {batch['messages']} messages, {batch['views']} views deleted"
+    ))
+    click.echo(
+        f"{purged} chats purged: {purger.stats['messages']} messages, "
+        f"{purger.stats['views']} views in {purger.stats['seconds']:.3f}s"
+    )
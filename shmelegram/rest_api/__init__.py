@@ -6,6 +6,7 @@ Defines following classes:
     - `user/UserApi`
     - `user/UserChatListApi`
     - `user/UnreadMessagesUserChatApi`
+    - `user/UserUpdatesApi`
     - `chat/ChatBaseApi`
     - `chat/ChatApi`
     - `chat/ChatListApi`
@@ -6,6 +6,7 @@ Defines following classes:
     - `UserApi`
     - `UserChatListApi`
     - `UnreadMessagesUserChatApi`
+    - `UserUpdatesApi`
 """
 
 from flask import request
@@ -13,7 +14,7 @@ from flask_restful import Resource
 
 from shmelegram import api
 from shmelegram.models import Chat, User
-from shmelegram.service import ChatService, UserService
+from shmelegram.service import ChatService, UpdateService, UserService
 from shmelegram.rest_api import JsonDict, StatusCode
 from shmelegram.rest_api.chat import ChatBaseApi
 
@@ -135,3 +136,36 @@ class UnreadMessagesUserChatApi(UserBaseApi):
         return {'messages': ChatService.get_unread_messages(
             chat_id, user_id
         )}, StatusCode(200)
+
+
+@api.resource('/users/<int:user_id>/updates')
+class UserUpdatesApi(UserBaseApi):
+    """API class for long-polling user's update log."""
+
+    def get(self, user_id: int) -> tuple[JsonDict, StatusCode]:
+        """
+        GET request handler.
+        Get updates of user newer than offset, oldest first.
+
+        Offset is passed via 'offset' url parameter, -1 returns only the current offset.
+        Long-polling timeout in seconds is passed via 'timeout' url parameter,
+            capped by `Config.UPDATES_MAX_TIMEOUT`.
+        Max number of updates is passed via 'limit' url parameter,
+            capped by `Config.UPDATES_LIMIT`.
+
+        If such user does not exist, return not exists message and 404 status code.
+        Otherwise return json data and 200 status code.
+
+        Args:
+            user_id (int): fetch updates of user with this id
+
+        Returns:
+            tuple[JsonDict, StatusCode]
+        """
+        if not User.exists(user_id):
+            return self.NOT_EXISTS_MESSAGE, StatusCode(404)
+        return UpdateService.wait_updates(
+            user_id, offset=request.args.get('offset', 0, int),
+            timeout=request.args.get('timeout', 0, float),
+            limit=request.args.get('limit', None, int)
+        ), StatusCode(200)
@@ -4,6 +4,7 @@ Defines following classes:
     - `ChatSchema`
     - `UserSchema`
     - `MessageSchema`
+    - `UserUpdateSchema`
 """
 
 # pylint: disable=too-few-public-methods
@@ -11,7 +12,8 @@ Defines following classes:
 from marshmallow import fields
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 
-from shmelegram.models import Chat, User, Message
+from shmelegram.models import Chat, User, Message, UserUpdate
+from shmelegram.utils import encoding
 
 class ChatSchema(SQLAlchemyAutoSchema):
     """Schema for chat json dumping"""
@@ -55,3 +57,26 @@ class MessageSchema(SQLAlchemyAutoSchema):
         model = Message
         include_fk = False
         include_relationships = True
+
+
+class UserUpdateSchema(SQLAlchemyAutoSchema):
+    """Schema for user update json dumping"""
+
+    class Meta:
+        """User update schema metadata"""
+        model = UserUpdate
+        fields = ('id', 'event', 'data', 'created_at')
+
+    data = fields.Method('get_data')
+
+    def get_data(self, update: UserUpdate):
+        """
+        Get decoded event data of update.
+
+        Args:
+            update (UserUpdate)
+
+        Returns:
+            JsonDict
+        """
+        return encoding.loads(update.payload)
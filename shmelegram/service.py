@@ -5,15 +5,25 @@ Defines the following classes:
     - `UserService`, service for user operations
     - `ChatService`, service for chat operations
     - `MessageService`, service for message operations
+    - `UpdateService`, service for per-user update log operations
 """
 
+import time
 from abc import ABC
-from typing import Any
+from datetime import datetime, timedelta
+from typing import Any, Iterable, Iterator, NoReturn, Optional
 
-from shmelegram import db
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.orm import load_only
+
+from shmelegram import db, socketio
 from shmelegram.config import Config
-from shmelegram.models import Chat, User
-from shmelegram.schema import ChatSchema, MessageSchema, UserSchema
+from shmelegram.models import (
+    Chat, Message, User, UserUpdate, chat_membership, message_view
+)
+from shmelegram.schema import ChatSchema, MessageSchema, UserSchema, UserUpdateSchema
+from shmelegram.utils import encoding
 
 JsonDict = dict[str, Any]
 
@@ -120,7 +130,9 @@ class ChatService(BaseService):
         Returns:
             list[JsonDict]: list of json datas of chats
         """
-        chats = Chat.query.filter(Chat.title.startswith(startwith))
+        chats = Chat.query.filter(
+            Chat.title.startswith(startwith), Chat.deleted_at.is_(None)
+        )
         if page != -1:
             chats = chats.offset(
                 (page - 1) * Config.API_RESPONSE_SIZE
@@ -165,6 +177,87 @@ class ChatService(BaseService):
         user = User.get(user_id)
         return [x.id for x in chat.get_unread_messages(user)]
 
+    @classmethod
+    def get_deleted_ids(cls) -> list[int]:
+        """
+        Get ids of deleted chats waiting for purging, oldest deleted first.
+
+        Returns:
+            list[int]
+        """
+        return list(db.session.execute(
+            select(Chat.id).where(Chat.is_deleted).order_by(Chat.deleted_at)
+        ).scalars())
+
+    @classmethod
+    def get_purge_backlog(cls) -> JsonDict:
+        """
+        Get number of deleted chats and their messages waiting for purging.
+
+        Returns:
+            JsonDict: {'chats': int, 'messages': int}
+        """
+        deleted_ids = select(Chat.id).where(Chat.is_deleted)
+        return {
+            'chats': db.session.execute(
+                select(func.count()).select_from(deleted_ids.subquery())
+            ).scalar(),
+            'messages': db.session.execute(
+                select(func.count(Message.id)).where(Message.chat_id.in_(deleted_ids))
+            ).scalar()
+        }
+
+    @classmethod
+    def purge_chat(cls, chat_id: int, batch_size: int) -> Iterator[tuple[int, int]]:
+        """
+        Purge deleted chat: delete its messages and their views in batches
+            of `batch_size` messages, each batch in its own transaction,
+            then delete the chat itself.
+        No models are loaded, every batch is a bulk SQL `DELETE`.
+
+        Args:
+            chat_id (int): id of deleted chat
+            batch_size (int): max number of messages deleted in one batch
+
+        Yields:
+            tuple[int, int]: numbers of messages and views deleted by a batch
+        """
+        while True:
+            with db.session.begin():
+                message_ids = list(db.session.execute(
+                    select(Message.id).where(Message.chat_id == chat_id)
+                    .limit(batch_size)
+                ).scalars())
+                if not message_ids:
+                    Chat.query.filter(Chat.id == chat_id, Chat.is_deleted).delete(
+                        synchronize_session=False
+                    )
+                    return
+                view_count = db.session.execute(message_view.delete().where(
+                    message_view.c.message_id.in_(message_ids)
+                )).rowcount
+                db.session.execute(Message.__table__.delete().where(
+                    Message.id.in_(message_ids)
+                ))
+            yield len(message_ids), view_count
+
+    @classmethod
+    def get_member_ids(cls, chat_id: int) -> list[int]:
+        """
+        Get ids of chat members without loading user models.
+
+        Args:
+            chat_id (int)
+
+        Returns:
+            list[int]
+        """
+        return list(db.session.execute(
+            select(chat_membership.c.user_id).where(
+                chat_membership.c.chat_id == chat_id
+            )
+        ).scalars())
+
 
 class MessageService(BaseService):
     """
@@ -174,3 +267,273 @@ class MessageService(BaseService):
         schema (MessageSchema): used for message json dumping
     """
     schema = MessageSchema()
+
+    @classmethod
+    def get_member_messages(
+        cls, user_id: int, message_ids: Iterable[int]
+    ) -> dict[int, Message]:
+        """
+        Get messages by ids in one query, only from chats the user is member of.
+        Only 'id', 'chat_id' and 'from_user_id' columns are loaded.
+
+        Args:
+            user_id (int): member user id
+            message_ids (Iterable[int]): ids of messages to retrieve
+
+        Returns:
+            dict[int, Message]: messages by their ids
+        """
+        message_ids = set(message_ids)
+        if not message_ids:
+            return {}
+        messages = Message.query.join(
+            chat_membership, chat_membership.c.chat_id == Message.chat_id
+        ).filter(
+            chat_membership.c.user_id == user_id, Message.id.in_(message_ids)
+        ).options(load_only('id', 'chat_id', 'from_user_id')).all()
+        return {message.id: message for message in messages}
+
+    @classmethod
+    def add_views(cls, user_id: int, message_ids: Iterable[int]) -> list[int]:
+        """
+        Add views by user to messages with one bulk insert.
+        Messages already seen by user are skipped.
+        Membership of user is not checked, see `get_member_messages`.
+
+        Args:
+            user_id (int): viewer user id
+            message_ids (Iterable[int]): ids of viewed messages
+
+        Returns:
+            list[int]: ids of messages that were not seen by user before
+        """
+        message_ids = list(dict.fromkeys(message_ids))
+        if not message_ids:
+            return []
+        seen_ids = set(db.session.execute(
+            select(message_view.c.message_id).where(
+                message_view.c.user_id == user_id,
+                message_view.c.message_id.in_(message_ids)
+            )
+        ).scalars())
+        new_ids = [id_ for id_ in message_ids if id_ not in seen_ids]
+        if new_ids:
+            db.session.execute(message_view.insert(), [
+                {'user_id': user_id, 'message_id': id_} for id_ in new_ids
+            ])
+        return new_ids
+
+    @classmethod
+    def edit_messages(cls, edits: Iterable[tuple[int, str, datetime]]) -> NoReturn:
+        """
+        Update text and edit time of messages with one bulk update.
+
+        Args:
+            edits (Iterable[tuple[int, str, datetime]]): tuples of
+                message id, new text and edit time
+
+        Returns:
+            NoReturn
+        """
+        mappings = [
+            {'id': id_, 'text': text, 'edited_at': edited_at}
+            for id_, text, edited_at in edits
+        ]
+        if mappings:
+            db.session.bulk_update_mappings(Message, mappings)
+
+    @classmethod
+    def delete_messages(cls, message_ids: Iterable[int]) -> NoReturn:
+        """
+        Delete messages with one bulk delete.
+        Views and replies are handled by database `ON DELETE` clauses.
+
+        Args:
+            message_ids (Iterable[int]): ids of messages to be deleted
+
+        Returns:
+            NoReturn
+        """
+        message_ids = set(message_ids)
+        if message_ids:
+            Message.query.filter(Message.id.in_(message_ids)).delete(
+                synchronize_session='fetch'
+            )
+
+
+class UpdateService(BaseService):
+    """
+    Service for per-user update log operations.
+    Every event delivered to a user over Socket.IO is also recorded
+        in their update log, so that reconnecting clients and bots
+        can fetch missed events by offset (id of the last received update).
+
+    Class attributes:
+        schema (UserUpdateSchema): used for update json dumping
+    """
+    schema = UserUpdateSchema()
+    _pruned_at = 0.0
+
+    @classmethod
+    def record(
+        cls, event: str, data: JsonDict, *, chat_id: Optional[int] = None,
+        user_ids: Iterable[int] = (), skip_user_id: Optional[int] = None
+    ) -> NoReturn:
+        """
+        Record event in update logs of chat members and/or given users.
+        See `record_many`.
+
+        Args:
+            event (str): event name
+            data (JsonDict): event data
+            chat_id (Optional[int], optional): chat whose members receive the event.
+                Defaults to None.
+            user_ids (Iterable[int], optional): additional recipients. Defaults to ().
+            skip_user_id (Optional[int], optional): user not receiving the event.
+                Defaults to None.
+
+        Returns:
+            NoReturn
+        """
+        cls.record_many(
+            [{'event': event, 'data': data}], chat_id=chat_id,
+            user_ids=user_ids, skip_user_id=skip_user_id
+        )
+
+    @classmethod
+    def record_many(
+        cls, events: list[JsonDict], *, chat_id: Optional[int] = None,
+        user_ids: Iterable[int] = (), skip_user_id: Optional[int] = None
+    ) -> NoReturn:
+        """
+        Record list of {'event': str, 'data': JsonDict} events in update logs
+            of chat members and/or given users with one bulk insert.
+        Event data is encoded once, no matter the number of recipients.
+
+        Args:
+            events (list[JsonDict]): events in order of delivery
+            chat_id (Optional[int], optional): chat whose members receive the events.
+                Defaults to None.
+            user_ids (Iterable[int], optional): additional recipients. Defaults to ().
+            skip_user_id (Optional[int], optional): user not receiving the events.
+                Defaults to None.
+
+        Returns:
+            NoReturn
+        """
+        recipients = set(user_ids)
+        if chat_id is not None:
+            recipients.update(ChatService.get_member_ids(chat_id))
+        recipients.discard(skip_user_id)
+        if not events or not recipients:
+            return
+        now = datetime.utcnow()
+        encoded = [(event['event'], encoding.dumps(event['data'])) for event in events]
+        db.session.execute(UserUpdate.__table__.insert(), [
+            {'user_id': user_id, 'event': event, 'payload': payload, 'created_at': now}
+            for event, payload in encoded
+            for user_id in sorted(recipients)
+        ])
+        cls.prune_if_due()
+
+    @classmethod
+    def get_updates(
+        cls, user_id: int, offset: int = 0, limit: Optional[int] = None
+    ) -> JsonDict:
+        """
+        Get updates of user newer than `offset`, oldest first.
+
+        `offset` can take a special value of -1, if so, no updates are returned,
+            only the current offset, which is used by clients to start the stream.
+
+        Returned 'gap' is True if update at `offset` is already pruned, so some
+            updates after it may be lost, in which case the client has to reload its state.
+
+        Args:
+            user_id (int): recipient user id
+            offset (int, optional): id of the last received update. Defaults to 0.
+            limit (Optional[int], optional): max number of updates,
+                capped by `UPDATES_LIMIT` config value. Defaults to None.
+
+        Returns:
+            JsonDict: {'updates': list[JsonDict], 'offset': int, 'gap': bool}
+        """
+        max_limit = current_app.config['UPDATES_LIMIT']
+        limit = max_limit if limit is None else max(1, min(limit, max_limit))
+        user_updates = UserUpdate.query.filter(UserUpdate.user_id == user_id)
+        if offset == -1:
+            latest = user_updates.with_entities(func.max(UserUpdate.id)).scalar()
+            return {'updates': [], 'offset': latest or 0, 'gap': False}
+        updates = user_updates.filter(UserUpdate.id > offset).order_by(
+            UserUpdate.id
+        ).limit(limit).all()
+        # log is pruned oldest first, so updates after `offset`
+        #   may be lost only if the update at `offset` itself is pruned
+        gap = offset > 0 and not db.session.query(
+            user_updates.filter(UserUpdate.id == offset).exists()
+        ).scalar()
+        return {
+            'updates': cls.schema.dump(updates, many=True),
+            'offset': updates[-1].id if updates else offset,
+            'gap': gap
+        }
+
+    @classmethod
+    def wait_updates(
+        cls, user_id: int, offset: int = 0, timeout: float = 0,
+        limit: Optional[int] = None
+    ) -> JsonDict:
+        """
+        Long-poll updates of user: wait up to `timeout` seconds
+            until there are updates newer than `offset`.
+        `timeout` is capped by `UPDATES_MAX_TIMEOUT` config value.
+        See `get_updates`.
+
+        Args:
+            user_id (int): recipient user id
+            offset (int, optional): id of the last received update. Defaults to 0.
+            timeout (float, optional): max waiting time in seconds. Defaults to 0.
+            limit (Optional[int], optional): max number of updates. Defaults to None.
+
+        Returns:
+            JsonDict: {'updates': list[JsonDict], 'offset': int, 'gap': bool}
+        """
+        timeout = max(0, min(timeout, current_app.config['UPDATES_MAX_TIMEOUT']))
+        interval = current_app.config['UPDATES_POLL_INTERVAL']
+        deadline = time.monotonic() + timeout
+        while True:
+            result = cls.get_updates(user_id, offset, limit)
+            remaining = deadline - time.monotonic()
+            if result['updates'] or result['gap'] or offset == -1 or remaining <= 0:
+                return result
+            # release connection to the pool while waiting
+            db.session.remove()
+            socketio.sleep(min(interval, remaining))
+
+    @classmethod
+    def prune(cls) -> int:
+        """
+        Delete updates older than `UPDATE_LOG_RETENTION` config value (in seconds).
+
+        Returns:
+            int: number of deleted updates
+        """
+        cutoff = datetime.utcnow() - timedelta(
+            seconds=current_app.config['UPDATE_LOG_RETENTION']
+        )
+        return UserUpdate.query.filter(UserUpdate.created_at < cutoff).delete(
+            synchronize_session=False
+        )
+
+    @classmethod
+    def prune_if_due(cls) -> NoReturn:
+        """
+        Prune update log at most once per hour per process.
+
+        Returns:
+            NoReturn
+        """
+        now = time.monotonic()
+        if now - cls._pruned_at >= 3600:
+            cls._pruned_at = now
+            cls.prune()
@@ -86,4 +86,15 @@ export async function getUserChats(userId) {
         error: function() { chats = []; }
     });
     return chats;    
-}
\ No newline at end of file
+}
+
+export async function getUpdates(userId, offset = 0, timeout = 0) {
+    let updates = null;
+    await $.ajax({
+        url: `/api/users/${userId}/updates?offset=${offset}&timeout=${timeout}`,
+        type: 'GET',
+        success: function(response) { updates = response; },
+        error: function() { updates = null; }
+    });
+    return updates;
+}
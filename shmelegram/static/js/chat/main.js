@@ -7,6 +7,10 @@ import {
 import { Message, EditMessage, ReplyMessage } from './message.js';
 import { ChatMessagesDisplay, ChatListDisplay, ChatInfoDisplay, cancelMessageAction } from './display.js';
 import { getCookie } from '../utils/storage.js';
+import * as msgpackParser from '../utils/msgpack.js';
+
+
+const SOCKETIO_SERIALIZER = $('meta[name="socketio-serializer"]').attr('content');
 
 
 
@@ -17,6 +21,7 @@ const GLOBAL = {
     activeChatDisplay: null, messageAPILength: 50,
     infoDisplay: null, maxGroupMemberCount: 50,
     isLoadingMessages: false, __messageAction: null,
+    updatesOffset: null, isSyncing: false,
     state: new State(), __previousScrollPosition: null,
     get messageAction() {
         return this.__messageAction === null ? new Message(
@@ -34,16 +39,17 @@ const GLOBAL = {
         'http://' + document.domain + ':' + location.port, 
         {query: {
             user_id: parseInt(getCookie('userID'))
-        }}
+        }, parser: SOCKETIO_SERIALIZER === 'msgpack' ? msgpackParser : undefined}
     )
 }
 
 export const messageObserver = new IntersectionObserver(function(entries, observer) {
     const chatId = GLOBAL.activeChatDisplay.chatId;
+    const views = [];
     for (let entry of entries) {
         if (!entry.isIntersecting) continue;
         let messageId = parseInt(entry.target.getAttribute('data-message-id'));
-        GLOBAL.socket.emit('add_view', {message_id: messageId});
+        views.push({event: 'add_view', data: {message_id: messageId}});
         entry.target.classList.remove('unread');
         observer.unobserve(entry.target);
         let message = GLOBAL.state.getMessage(chatId, messageId);
@@ -53,6 +59,8 @@ export const messageObserver = new IntersectionObserver(function(entries, observ
         GLOBAL.state.save();
         ChatListDisplay.updateChat(chatId);
     }
+    if (views.length)
+        GLOBAL.socket.emit('batch', views);
 }, {threshold: 1});
 
 
@@ -68,8 +76,38 @@ function hideActiveChat() {
 }
 
 
+async function syncUpdates() {
+    // fetch events missed while socket was disconnected
+    if (GLOBAL.updatesOffset === null || GLOBAL.isSyncing) return;
+    GLOBAL.isSyncing = true;
+    let result;
+    do {
+        result = await new Promise(resolve => GLOBAL.socket.timeout(10000).emit(
+            'sync', {offset: GLOBAL.updatesOffset},
+            (err, response) => resolve(err ? null : response)
+        ));
+        if (result === null) break;
+        if (result.gap) {
+            // missed updates are pruned, state has to be loaded from scratch
+            location.reload();
+            return;
+        }
+        for (let {event, data} of result.updates) {
+            for (let listener of GLOBAL.socket.listeners(event))
+                await listener(data);
+        }
+        GLOBAL.updatesOffset = result.offset;
+    } while (result.updates.length);
+    GLOBAL.isSyncing = false;
+}
+
+
 $(document).ready(async function() {
     GLOBAL.state.empty();
+    // offset is fetched before state, so no event is missed while it is loading
+    GLOBAL.updatesOffset = (
+        await Api.getUpdates(GLOBAL.state.currentUserId, -1)
+    )?.offset ?? null;
     for (let chatData of await Api.getUserChats(GLOBAL.state.currentUserId)) {
         chatData.unreadMessagesCount = await Api.getUnreadMessagesCount(
             chatData.id, GLOBAL.state.currentUserId
@@ -364,8 +402,10 @@ $('#chat-messages').scroll(async function() {
 });
 
 
+GLOBAL.socket.io.on('reconnect', syncUpdates);
+
 GLOBAL.socket.on('message', async function(message) {
-    GLOBAL.state.appendMessage(message);
+    if (!GLOBAL.state.appendMessage(message)) return;
     GLOBAL.state.save();
     if (message.chat === GLOBAL.activeChatDisplay?.chatId) {
         await GLOBAL.activeChatDisplay.addMessage(message);
@@ -391,10 +431,21 @@ GLOBAL.socket.on('update_user_status', function(data) {
         );
 });
 
+GLOBAL.socket.on('batch', async function(events) {
+    // coalesced server events, dispatched to the regular event listeners in order
+    for (let {event, data} of events) {
+        for (let listener of GLOBAL.socket.listeners(event))
+            await listener(data);
+    }
+});
+
 GLOBAL.socket.on('update_view', function(data) {
     const message = GLOBAL.state.getMessage(data.chat_id, data.message_id);
     if (!message) return;
-    message.seen_by.push(data.user_id);
+    for (let userId of data.user_ids ?? [data.user_id]) {
+        if (!message.seen_by.includes(userId))
+            message.seen_by.push(userId);
+    }
     GLOBAL.state.save();
     ChatListDisplay.updateChat(message.chat);
     if (GLOBAL.activeChatDisplay?.chatId !== data.chat_id) return;
@@ -429,6 +480,7 @@ GLOBAL.socket.on('edit_message', function(data) {
 });
 
 GLOBAL.socket.on('add_chat', async function(data) {
+    if (GLOBAL.state.getChat(data.id)) return;
     data.unreadMessagesCount = await Api.getUnreadMessagesCount(
         data.id, GLOBAL.state.currentUserId
     );
@@ -461,7 +513,7 @@ GLOBAL.socket.on('add_member', function(data) {
 });
 
 GLOBAL.socket.on('remove_chat', function(data) {
-    GLOBAL.state.removeChat(data.chat_id);
+    if (!GLOBAL.state.removeChat(data.chat_id)) return;
     GLOBAL.state.save()
     if (GLOBAL.activeChatDisplay?.chatId === data.chat_id) {
         GLOBAL.infoDisplay?.hide();
@@ -74,19 +74,21 @@ export default class State {
     }
 
     removeChat(chatId) {
+        if (!this.#state.chats.byId[chatId]) return false;
         delete this.#state.chats.byId[chatId];
         delete this.#state.messages[chatId];
         this.#state.chats.listIds.splice(
             this.#state.chats.listIds.findIndex(id => id === chatId),
             1
         )
+        return true;
     }
 
     removeMember(chatId, userId) {
         const members = this.#state.chats.byId[chatId]?.members;
         if (!members) return false;
         const userIndex = members.findIndex(id => id === userId);
-        if (!userIndex) return false;
+        if (userIndex === -1) return false;
         members.splice(userIndex, 1);
         return true;
     }
@@ -100,7 +102,7 @@ export default class State {
     appendMember(chatId, userId) {
         if (!this.userExists(userId)) return false;
         const members = this.#state.chats.byId[chatId]?.members;
-        if (!members) return false;
+        if (!members || members.includes(userId)) return false;
         members.push(userId);
         return true;
     }
@@ -118,7 +120,8 @@ export default class State {
 
     appendMessage(messageData) {
         const chatMessages = this.getChatMessages(messageData.chat);
-        if (!chatMessages) return false;
+        if (!chatMessages || chatMessages.some(msg => msg.id === messageData.id))
+            return false;
         chatMessages.push(messageData);
         return true;
     } 
@@ -0,0 +1,241 @@
+// Minimal MessagePack codec and Socket.IO parser, compatible with
+// python-socketio's `msgpack` serializer.
+
+const textEncoder = new TextEncoder();
+const textDecoder = new TextDecoder();
+
+
+class Writer {
+    #buffer = new Uint8Array(256);
+    #view = new DataView(this.#buffer.buffer);
+    length = 0;
+
+    #reserve(size) {
+        if (this.length + size <= this.#buffer.length) return;
+        let capacity = this.#buffer.length * 2;
+        while (capacity < this.length + size) capacity *= 2;
+        const buffer = new Uint8Array(capacity);
+        buffer.set(this.#buffer);
+        this.#buffer = buffer;
+        this.#view = new DataView(buffer.buffer);
+    }
+
+    uint8(value) { this.#reserve(1); this.#view.setUint8(this.length, value); this.length += 1; }
+    uint16(value) { this.#reserve(2); this.#view.setUint16(this.length, value); this.length += 2; }
+    uint32(value) { this.#reserve(4); this.#view.setUint32(this.length, value); this.length += 4; }
+    int8(value) { this.#reserve(1); this.#view.setInt8(this.length, value); this.length += 1; }
+    int16(value) { this.#reserve(2); this.#view.setInt16(this.length, value); this.length += 2; }
+    int32(value) { this.#reserve(4); this.#view.setInt32(this.length, value); this.length += 4; }
+    float64(value) { this.#reserve(8); this.#view.setFloat64(this.length, value); this.length += 8; }
+
+    bytes(value) {
+        this.#reserve(value.length);
+        this.#buffer.set(value, this.length);
+        this.length += value.length;
+    }
+
+    result() { return this.#buffer.slice(0, this.length); }
+}
+
+
+function writeHeader(writer, size, fix, fixMax, codes) {
+    if (fix !== null && size <= fixMax) writer.uint8(fix | size);
+    else if (codes[0] !== null && size < 0x100) { writer.uint8(codes[0]); writer.uint8(size); }
+    else if (size < 0x10000) { writer.uint8(codes[1]); writer.uint16(size); }
+    else { writer.uint8(codes[2]); writer.uint32(size); }
+}
+
+
+function writeValue(writer, value) {
+    if (value === null || value === undefined) {
+        writer.uint8(0xc0);
+    } else if (value === false || value === true) {
+        writer.uint8(value ? 0xc3 : 0xc2);
+    } else if (typeof value === 'number') {
+        if (!Number.isInteger(value) || value > 0xffffffff || value < -0x80000000) {
+            writer.uint8(0xcb); writer.float64(value);
+        } else if (value >= 0) {
+            if (value < 0x80) writer.uint8(value);
+            else if (value < 0x100) { writer.uint8(0xcc); writer.uint8(value); }
+            else if (value < 0x10000) { writer.uint8(0xcd); writer.uint16(value); }
+            else { writer.uint8(0xce); writer.uint32(value); }
+        } else {
+            if (value >= -0x20) writer.int8(value);
+            else if (value >= -0x80) { writer.uint8(0xd0); writer.int8(value); }
+            else if (value >= -0x8000) { writer.uint8(0xd1); writer.int16(value); }
+            else { writer.uint8(0xd2); writer.int32(value); }
+        }
+    } else if (typeof value === 'string') {
+        const encoded = textEncoder.encode(value);
+        writeHeader(writer, encoded.length, 0xa0, 0x1f, [0xd9, 0xda, 0xdb]);
+        writer.bytes(encoded);
+    } else if (value instanceof ArrayBuffer || ArrayBuffer.isView(value)) {
+        const bytes = value instanceof ArrayBuffer ? new Uint8Array(value) : new Uint8Array(
+            value.buffer, value.byteOffset, value.byteLength
+        );
+        writeHeader(writer, bytes.length, null, 0, [0xc4, 0xc5, 0xc6]);
+        writer.bytes(bytes);
+    } else if (Array.isArray(value)) {
+        writeHeader(writer, value.length, 0x90, 0x0f, [null, 0xdc, 0xdd]);
+        for (let item of value) writeValue(writer, item);
+    } else if (value instanceof Date) {
+        writeValue(writer, value.toISOString());
+    } else if (typeof value === 'object') {
+        const keys = Object.keys(value);
+        writeHeader(writer, keys.length, 0x80, 0x0f, [null, 0xde, 0xdf]);
+        for (let key of keys) {
+            writeValue(writer, key);
+            writeValue(writer, value[key]);
+        }
+    } else {
+        throw new TypeError(`msgpack: unsupported type ${typeof value}`);
+    }
+}
+
+
+export function encode(value) {
+    const writer = new Writer();
+    writeValue(writer, value);
+    return writer.result();
+}
+
+
+class Reader {
+    offset = 0;
+
+    constructor(buffer) {
+        this.bytes = buffer instanceof Uint8Array ? buffer : new Uint8Array(buffer);
+        this.view = new DataView(
+            this.bytes.buffer, this.bytes.byteOffset, this.bytes.byteLength
+        );
+    }
+
+    #advance(size) {
+        const offset = this.offset;
+        this.offset += size;
+        return offset;
+    }
+
+    uint8() { return this.view.getUint8(this.#advance(1)); }
+    uint16() { return this.view.getUint16(this.#advance(2)); }
+    uint32() { return this.view.getUint32(this.#advance(4)); }
+    uint64() { return Number(this.view.getBigUint64(this.#advance(8))); }
+    int8() { return this.view.getInt8(this.#advance(1)); }
+    int16() { return this.view.getInt16(this.#advance(2)); }
+    int32() { return this.view.getInt32(this.#advance(4)); }
+    int64() { return Number(this.view.getBigInt64(this.#advance(8))); }
+    float32() { return this.view.getFloat32(this.#advance(4)); }
+    float64() { return this.view.getFloat64(this.#advance(8)); }
+
+    str(size) {
+        const offset = this.#advance(size);
+        return textDecoder.decode(this.bytes.subarray(offset, offset + size));
+    }
+
+    bin(size) {
+        const offset = this.#advance(size);
+        return this.bytes.slice(offset, offset + size).buffer;
+    }
+
+    array(size) {
+        const result = new Array(size);
+        for (let i = 0; i < size; i++) result[i] = this.value();
+        return result;
+    }
+
+    map(size) {
+        const result = {};
+        for (let i = 0; i < size; i++) {
+            const key = this.value();
+            result[key] = this.value();
+        }
+        return result;
+    }
+
+    value() {
+        const code = this.uint8();
+        if (code < 0x80) return code;
+        if (code < 0x90) return this.map(code & 0x0f);
+        if (code < 0xa0) return this.array(code & 0x0f);
+        if (code < 0xc0) return this.str(code & 0x1f);
+        if (code >= 0xe0) return code - 0x100;
+        switch (code) {
+            case 0xc0: return null;
+            case 0xc2: return false;
+            case 0xc3: return true;
+            case 0xc4: return this.bin(this.uint8());
+            case 0xc5: return this.bin(this.uint16());
+            case 0xc6: return this.bin(this.uint32());
+            case 0xca: return this.float32();
+            case 0xcb: return this.float64();
+            case 0xcc: return this.uint8();
+            case 0xcd: return this.uint16();
+            case 0xce: return this.uint32();
+            case 0xcf: return this.uint64();
+            case 0xd0: return this.int8();
+            case 0xd1: return this.int16();
+            case 0xd2: return this.int32();
+            case 0xd3: return this.int64();
+            case 0xd9: return this.str(this.uint8());
+            case 0xda: return this.str(this.uint16());
+            case 0xdb: return this.str(this.uint32());
+            case 0xdc: return this.array(this.uint16());
+            case 0xdd: return this.array(this.uint32());
+            case 0xde: return this.map(this.uint16());
+            case 0xdf: return this.map(this.uint32());
+        }
+        throw new TypeError(`msgpack: unsupported type code 0x${code.toString(16)}`);
+    }
+}
+
+
+export function decode(buffer) {
+    return new Reader(buffer).value();
+}
+
+
+// Socket.IO parser interface, passed as `parser` option of `io()`
+
+export class Encoder {
+    encode(packet) {
+        return [encode({
+            type: packet.type, data: packet.data,
+            nsp: packet.nsp, id: packet.id
+        })];
+    }
+}
+
+
+export class Decoder {
+    #listeners = {};
+
+    on(event, listener) {
+        (this.#listeners[event] ||= []).push(listener);
+        return this;
+    }
+
+    off(event, listener) {
+        if (!listener) delete this.#listeners[event];
+        else this.#listeners[event] = (this.#listeners[event] || []).filter(
+            fn => fn !== listener
+        );
+        return this;
+    }
+
+    emit(event, ...args) {
+        for (let listener of [...(this.#listeners[event] || [])])
+            listener(...args);
+        return this;
+    }
+
+    add(chunk) {
+        const packet = decode(chunk);
+        if (typeof packet !== 'object' || packet === null || !Number.isInteger(packet.type))
+            throw new TypeError('msgpack: invalid Socket.IO packet');
+        packet.nsp ??= '/';
+        if (packet.id === null) delete packet.id;
+        this.emit('decoded', packet);
+    }
+
+    destroy() { this.#listeners = {}; }
+}
@@ -6,6 +6,13 @@ Defines following functions:
 
 Defines following classes:
     - `redis_client/RedisClient`
+    - `broadcast/PreEncodedManager`
+    - `encoding/JSONEncoder`
+    - `encoding/MsgPackPacket`
+    - `coalescer/EventCoalescer`
+    - `jobs/MemoryJobQueue`
+    - `jobs/RedisJobQueue`
+    - `jobs/JobRunner`
 """
 
 import string
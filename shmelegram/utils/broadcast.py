@@ -0,0 +1,90 @@
+"""
+This module provides Socket.IO client manager used for room broadcasts.
+Defines following classes:
+    - `PreEncodedManager`
+"""
+
+from typing import Any, NoReturn, Optional, Union
+
+from socketio import BaseManager
+from socketio import packet
+
+
+class PreEncodedManager(BaseManager):
+    """
+    Socket.IO client manager that encodes every broadcast only once.
+
+    Default manager builds and encodes a new packet for each recipient
+        of a room, so a message sent to a group of 50 members is serialized
+        50 times. This manager builds the packet once (using server's
+        `packet_class`, so both JSON and MessagePack serializers are supported),
+        encodes it once and sends the same encoded frames to every recipient.
+
+    Emits with acknowledgement callbacks get a packet id per recipient,
+        hence they are delegated to `BaseManager.emit`.
+    """
+
+    def emit(
+        self, event: str, data: Any, namespace: str, room: Optional[Any] = None,
+        skip_sid: Union[str, list[str], None] = None, callback=None, **kwargs
+    ) -> NoReturn:
+        """
+        Emit a message to a single client, a room, or all the clients
+            connected to the namespace.
+
+        Args:
+            event (str): event name
+            data (Any): event data, tuple is expanded to multiple arguments
+            namespace (str): namespace of recipients
+            room (Any, optional): room or list of rooms. Defaults to None.
+            skip_sid (Union[str, list[str], None], optional): sids to be skipped.
+                Defaults to None.
+            callback (Callable, optional): acknowledgement callback. Defaults to None.
+
+        Returns:
+            NoReturn
+        """
+        if callback is not None:
+            super().emit(
+                event, data, namespace, room=room, skip_sid=skip_sid,
+                callback=callback, **kwargs
+            )
+            return
+        if namespace not in self.rooms:
+            return
+        if not isinstance(skip_sid, list):
+            skip_sid = [skip_sid]
+        pkt = None
+        for sid, eio_sid in self.get_participants(namespace, room):
+            if sid in skip_sid:
+                continue
+            if pkt is None:
+                pkt = self.make_packet(event, data, namespace)
+            self.server._send_packet(eio_sid, pkt)  # pylint: disable=protected-access
+
+    def make_packet(self, event: str, data: Any, namespace: str) -> packet.Packet:
+        """
+        Make event packet of server's packet class, which is encoded only once,
+            no matter how many times its `encode` method is called.
+        Mirrors `socketio.Server._emit_internal` argument handling.
+
+        Args:
+            event (str): event name
+            data (Any): event data, tuple is expanded to multiple arguments
+            namespace (str): namespace of recipients
+
+        Returns:
+            packet.Packet
+        """
+        if isinstance(data, tuple):
+            data = list(data)
+        elif data is not None:
+            data = [data]
+        else:
+            data = []
+        pkt = self.server.packet_class(
+            packet.EVENT, namespace=namespace, data=[event] + data
+        )
+        encoded_packet = pkt.encode()
+        pkt.encode = lambda: encoded_packet
+        return pkt
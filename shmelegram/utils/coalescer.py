@@ -0,0 +1,191 @@
+"""
+This module provides coalescing of outbound Socket.IO room events.
+Defines following classes:
+    - `EventCoalescer`
+"""
+
+import threading
+from typing import Any, Callable, Hashable, NoReturn, Optional, Union
+
+from flask import Flask
+from flask_socketio import SocketIO
+
+
+JsonDict = dict[str, Any]
+
+
+class EventCoalescer:
+    """
+    Buffers outbound events per room for a short time window and delivers
+        them to the room as a single 'batch' event containing list of
+        {'event': str, 'data': JsonDict} dicts.
+
+    Redundant events are merged while buffered:
+        - 'update_view' events of one message are merged into one event
+            with 'user_ids' (list[int]) instead of 'user_id' (int);
+        - 'edit_message' events of one message and 'update_user_status'
+            events of one user are replaced by the latest one.
+
+    Events emitted with `skip_sid` are sent immediately after flushing
+        the room buffer, so the order of events in a room is preserved.
+
+    Coalescing is disabled if `EVENT_COALESCE_WINDOW` config value is 0,
+        in which case every event is emitted immediately.
+
+    Config values:
+        EVENT_COALESCE_WINDOW (float): buffering window in milliseconds
+        EVENT_COALESCE_MAX_BATCH (int): max number of events in a batch,
+            reaching it flushes the buffer before the window ends
+    """
+
+    BATCH_EVENT = 'batch'
+    MERGE_KEYS: dict[str, Callable[[JsonDict], Hashable]] = {
+        'update_view': lambda data: data['message_id'],
+        'edit_message': lambda data: data['message_id'],
+        'update_user_status': lambda data: data['user_id'],
+    }
+
+    def __init__(self, socketio: SocketIO, app: Optional[Flask] = None):
+        self.socketio = socketio
+        self.window = 0.0
+        self.max_batch = 1
+        self._lock = threading.Lock()
+        self._buffers: dict[Any, list[JsonDict]] = {}
+        self._indexes: dict[Any, dict[tuple[str, Hashable], int]] = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> NoReturn:
+        """
+        Read coalescing settings from app config.
+
+        Args:
+            app (Flask)
+
+        Returns:
+            NoReturn
+        """
+        self.window = app.config['EVENT_COALESCE_WINDOW'] / 1000
+        self.max_batch = max(1, app.config['EVENT_COALESCE_MAX_BATCH'])
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether events are coalesced.
+
+        Returns:
+            bool
+        """
+        return self.window > 0
+
+    def emit(
+        self, event: str, data: JsonDict, to: Any = None,
+        skip_sid: Union[str, list[str], None] = None
+    ) -> NoReturn:
+        """
+        Emit event to room, buffering it if coalescing is enabled.
+        Room of None means all connected clients.
+
+        Args:
+            event (str): event name
+            data (JsonDict): event data
+            to (Any, optional): room to emit to. Defaults to None.
+            skip_sid (Union[str, list[str], None], optional): sids to be skipped.
+                Defaults to None.
+
+        Returns:
+            NoReturn
+        """
+        if not self.enabled or skip_sid is not None:
+            if self.enabled:
+                self.flush(to)
+            self.socketio.emit(event, data, to=to, skip_sid=skip_sid)
+            return
+        with self._lock:
+            buffer = self._buffers.get(to)
+            is_new = buffer is None
+            if is_new:
+                buffer = self._buffers[to] = []
+                self._indexes[to] = {}
+            self._append(to, buffer, event, data)
+            is_full = len(buffer) >= self.max_batch
+        if is_full:
+            self.flush(to)
+        elif is_new:
+            self.socketio.start_background_task(self._flush_later, to)
+
+    def emit_many(self, events: list[JsonDict], to: Any = None) -> NoReturn:
+        """
+        Emit list of {'event': str, 'data': JsonDict} events to room at once.
+        If coalescing is disabled, events are delivered as a single 'batch' event.
+
+        Args:
+            events (list[JsonDict]): events to be emitted in order
+            to (Any, optional): room to emit to. Defaults to None.
+
+        Returns:
+            NoReturn
+        """
+        if self.enabled:
+            for event in events:
+                self.emit(event['event'], event['data'], to=to)
+        elif len(events) == 1:
+            self.socketio.emit(events[0]['event'], events[0]['data'], to=to)
+        elif events:
+            self.socketio.emit(self.BATCH_EVENT, events, to=to)
+
+    def _append(self, room: Any, buffer: list[JsonDict], event: str, data: JsonDict) -> NoReturn:
+        key_func = self.MERGE_KEYS.get(event)
+        if event == 'update_view':
+            data = {
+                key: value for key, value in data.items() if key != 'user_id'
+            } | {'user_ids': [data['user_id']]}
+        if key_func is None:
+            buffer.append({'event': event, 'data': data})
+            return
+        key = event, key_func(data)
+        index = self._indexes[room].get(key)
+        if index is None:
+            self._indexes[room][key] = len(buffer)
+            buffer.append({'event': event, 'data': data})
+        elif event == 'update_view':
+            user_ids = buffer[index]['data']['user_ids']
+            if data['user_ids'][0] not in user_ids:
+                user_ids.append(data['user_ids'][0])
+        else:
+            buffer[index]['data'] = data
+
+    def _flush_later(self, room: Any) -> NoReturn:
+        self.socketio.sleep(self.window)
+        self.flush(room)
+
+    def flush(self, room: Any) -> NoReturn:
+        """
+        Deliver buffered events of room.
+        Single buffered event is delivered as is, without batch wrapping.
+
+        Args:
+            room (Any)
+
+        Returns:
+            NoReturn
+        """
+        with self._lock:
+            buffer = self._buffers.pop(room, None)
+            self._indexes.pop(room, None)
+        if not buffer:
+            return
+        if len(buffer) == 1:
+            self.socketio.emit(buffer[0]['event'], buffer[0]['data'], to=room)
+        else:
+            self.socketio.emit(self.BATCH_EVENT, buffer, to=room)
+
+    def flush_all(self) -> NoReturn:
+        """
+        Deliver buffered events of every room.
+
+        Returns:
+            NoReturn
+        """
+        for room in list(self._buffers):
+            self.flush(room)
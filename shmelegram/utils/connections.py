@@ -0,0 +1,237 @@
+"""
+This module provides registry of Socket.IO connections shared by all nodes.
+Defines following classes:
+    - `ConnectionRegistry`
+"""
+
+import atexit
+import os
+import socket
+import threading
+import uuid
+from typing import NoReturn, Optional
+
+from flask import Flask
+from flask_socketio import SocketIO
+from redis import RedisError
+
+
+class ConnectionRegistry:
+    """
+    Registry of Socket.IO connections stored in Redis.
+
+    Key layout (all keys are prefixed with `REDIS_KEY_PREFIX`):
+        conn:{sid} (str): id of connected user
+        user:{user_id}:sids (set): sids of user's connections on all nodes
+        node:{node_id}:sids (set): sids of connections owned by node
+        node:{node_id}:alive (str): heartbeat key of node
+        nodes (set): ids of nodes
+
+    Every key expires after `CONNECTION_TTL` seconds, TTLs of node's keys are
+        refreshed by a heartbeat background task, so keys of a crashed node
+        disappear by themselves. Keys of nodes with expired heartbeat key
+        are removed earlier by node-scoped cleanup, run on every heartbeat.
+
+    Config values:
+        NODE_ID (Optional[str]): id of the node, defaults to hostname, pid
+            and random suffix
+        CONNECTION_TTL (int): TTL of keys in seconds
+        REDIS_KEY_PREFIX (str): prefix of all keys
+    """
+
+    def __init__(self, redis, socketio: SocketIO, app: Optional[Flask] = None):
+        self.redis = redis
+        self.socketio = socketio
+        self.node_id = None
+        self.ttl = 120
+        self.prefix = ''
+        self._local: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._heartbeat_started = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> NoReturn:
+        """
+        Read registry settings from app config.
+        Node keys are removed on interpreter exit.
+
+        Args:
+            app (Flask)
+
+        Returns:
+            NoReturn
+        """
+        self.node_id = app.config['NODE_ID'] or (
+            f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        )
+        self.ttl = max(3, app.config['CONNECTION_TTL'])
+        self.prefix = app.config['REDIS_KEY_PREFIX']
+        app.extensions['connections'] = self
+        atexit.register(self._cleanup_on_exit)
+
+    def _key(self, *parts) -> str:
+        return self.prefix + ':'.join(map(str, parts))
+
+    def add(self, sid: str, user_id: int) -> NoReturn:
+        """
+        Register connection of user owned by this node.
+
+        Args:
+            sid (str): Socket.IO sid
+            user_id (int)
+
+        Returns:
+            NoReturn
+        """
+        user_id = int(user_id)
+        self._local[sid] = user_id
+        with self.redis.pipeline() as pipe:
+            pipe.set(self._key('conn', sid), user_id, ex=self.ttl)
+            pipe.sadd(self._key('user', user_id, 'sids'), sid)
+            pipe.expire(self._key('user', user_id, 'sids'), self.ttl)
+            pipe.sadd(self._key('node', self.node_id, 'sids'), sid)
+            pipe.expire(self._key('node', self.node_id, 'sids'), self.ttl)
+            pipe.execute()
+        self._start_heartbeat()
+
+    def remove(self, sid: str) -> NoReturn:
+        """
+        Unregister connection owned by this node.
+
+        Args:
+            sid (str): Socket.IO sid
+
+        Returns:
+            NoReturn
+        """
+        user_id = self._local.pop(sid, None)
+        if user_id is None:
+            user_id = self.get_user_id(sid)
+        with self.redis.pipeline() as pipe:
+            pipe.delete(self._key('conn', sid))
+            if user_id is not None:
+                pipe.srem(self._key('user', user_id, 'sids'), sid)
+            pipe.srem(self._key('node', self.node_id, 'sids'), sid)
+            pipe.execute()
+
+    def get_user_id(self, sid: str) -> Optional[int]:
+        """
+        Get id of user connected with sid.
+        Connections owned by this node are resolved without Redis.
+
+        Args:
+            sid (str): Socket.IO sid
+
+        Returns:
+            Optional[int]: None if there is no such connection
+        """
+        user_id = self._local.get(sid)
+        if user_id is not None:
+            return user_id
+        user_id = self.redis.get(self._key('conn', sid))
+        return None if user_id is None else int(user_id)
+
+    def get_sids(self, user_id: int) -> set[str]:
+        """
+        Get sids of all live connections of user on all nodes.
+
+        Args:
+            user_id (int)
+
+        Returns:
+            set[str]
+        """
+        sids = self.redis.smembers(self._key('user', int(user_id), 'sids'))
+        return {
+            sid.decode('utf-8') if isinstance(sid, bytes) else sid
+            for sid in sids if self.redis.exists(self._key('conn', sid))
+        }
+
+    def _start_heartbeat(self) -> NoReturn:
+        with self._lock:
+            if self._heartbeat_started:
+                return
+            self._heartbeat_started = True
+        self.heartbeat()
+        self.socketio.start_background_task(self._heartbeat_loop)
+
+    def _heartbeat_loop(self) -> NoReturn:
+        while True:
+            self.socketio.sleep(self.ttl / 3)
+            try:
+                self.heartbeat()
+                self.cleanup_dead_nodes()
+            except RedisError:
+                pass
+
+    def heartbeat(self) -> NoReturn:
+        """
+        Refresh heartbeat key of this node and TTLs of its connection keys.
+
+        Returns:
+            NoReturn
+        """
+        with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(self._key('node', self.node_id, 'alive'), 1, ex=self.ttl)
+            pipe.sadd(self._key('nodes'), self.node_id)
+            pipe.expire(self._key('node', self.node_id, 'sids'), self.ttl)
+            for sid, user_id in list(self._local.items()):
+                pipe.expire(self._key('conn', sid), self.ttl)
+                pipe.expire(self._key('user', user_id, 'sids'), self.ttl)
+            pipe.execute()
+
+    def cleanup_dead_nodes(self) -> list[str]:
+        """
+        Remove keys of nodes whose heartbeat key has expired.
+
+        Returns:
+            list[str]: ids of cleaned up nodes
+        """
+        dead = []
+        for node_id in self.redis.smembers(self._key('nodes')):
+            if isinstance(node_id, bytes):
+                node_id = node_id.decode('utf-8')
+            if node_id != self.node_id and not self.redis.exists(
+                self._key('node', node_id, 'alive')
+            ):
+                self.cleanup_node(node_id)
+                dead.append(node_id)
+        return dead
+
+    def cleanup_node(self, node_id: str) -> int:
+        """
+        Remove keys owned by node: its connections, their sids
+            in user sets and the node keys. Keys of other nodes are not touched.
+
+        Args:
+            node_id (str)
+
+        Returns:
+            int: number of removed connections
+        """
+        sids = self.redis.smembers(self._key('node', node_id, 'sids'))
+        for sid in sids:
+            if isinstance(sid, bytes):
+                sid = sid.decode('utf-8')
+            user_id = self.redis.get(self._key('conn', sid))
+            with self.redis.pipeline() as pipe:
+                pipe.delete(self._key('conn', sid))
+                if user_id is not None:
+                    pipe.srem(self._key('user', int(user_id), 'sids'), sid)
+                pipe.execute()
+        self.redis.delete(
+            self._key('node', node_id, 'sids'), self._key('node', node_id, 'alive')
+        )
+        self.redis.srem(self._key('nodes'), node_id)
+        if node_id == self.node_id:
+            self._local.clear()
+        return len(sids)
+
+    def _cleanup_on_exit(self) -> NoReturn:
+        if not self._heartbeat_started:
+            return
+        try:
+            self.cleanup_node(self.node_id)
+        except RedisError:
+            pass
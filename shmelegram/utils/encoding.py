@@ -0,0 +1,206 @@
+"""
+This module provides unified JSON encoding used by Flask, flask-restful
+and Flask-SocketIO. Datetimes and enumerations are handled natively.
+If `orjson` is installed it is used as a backend, otherwise stdlib `json` is used.
+Defines following functions:
+    - `configure`
+    - `dumps`
+    - `loads`
+    - `default`
+    - `parse_datetime`
+    - `output_json`, flask-restful representation
+
+Defines following classes:
+    - `JSONEncoder`, Flask json encoder
+    - `MsgPackPacket`, Socket.IO packet class for `msgpack` serializer
+"""
+
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, NoReturn, Optional
+
+from flask import make_response
+from flask.json import JSONEncoder as FlaskJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+from socketio import packet
+
+
+BACKENDS = ('auto', 'orjson', 'stdlib')
+_backend = 'orjson' if orjson is not None else 'stdlib'
+
+
+def configure(backend: str = 'auto') -> NoReturn:
+    """
+    Select JSON backend.
+
+    Args:
+        backend (str, optional): one of `BACKENDS`. 'auto' selects `orjson`
+            if it is installed. Defaults to 'auto'.
+
+    Raises:
+        ValueError: unknown backend or `orjson` is not installed
+
+    Returns:
+        NoReturn
+    """
+    # pylint: disable=global-statement
+    global _backend
+    if backend not in BACKENDS:
+        raise ValueError(f'unknown json backend {backend!r}')
+    if backend == 'orjson' and orjson is None:
+        raise ValueError('orjson backend requires orjson package')
+    if backend == 'auto':
+        backend = 'orjson' if orjson is not None else 'stdlib'
+    _backend = backend
+
+
+def get_backend() -> str:
+    """
+    Get name of currently used backend.
+
+    Returns:
+        str: 'orjson' or 'stdlib'
+    """
+    return _backend
+
+
+def default(obj: Any) -> Any:
+    """
+    Convert objects not supported by JSON into supported ones.
+    Datetimes are converted to ISO 8601 strings, enumerations to their values.
+
+    Args:
+        obj (Any)
+
+    Raises:
+        TypeError: object is not serializable
+
+    Returns:
+        Any: JSON serializable object
+    """
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps(obj: Any, **kwargs) -> str:
+    """
+    Serialize object to compact JSON string.
+    Keyword arguments are accepted for compatibility with stdlib `json.dumps`
+        and are passed to it only if stdlib backend is used.
+
+    Args:
+        obj (Any)
+
+    Returns:
+        str
+    """
+    if _backend == 'orjson':
+        return orjson.dumps(
+            obj, default=default, option=orjson.OPT_NON_STR_KEYS
+        ).decode('utf-8')
+    kwargs.setdefault('separators', (',', ':'))
+    kwargs.setdefault('default', default)
+    kwargs.pop('cls', None)
+    return json.dumps(obj, **kwargs)
+
+
+def loads(data: Any, **kwargs) -> Any:
+    """
+    Deserialize JSON string or bytes.
+    Keyword arguments are accepted for compatibility with stdlib `json.loads`
+        and are passed to it only if stdlib backend is used.
+
+    Args:
+        data (Union[str, bytes])
+
+    Returns:
+        Any
+    """
+    if _backend == 'orjson':
+        return orjson.loads(data)
+    return json.loads(data, **kwargs)
+
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parse ISO 8601 datetime string, as produced by `dumps` or by the client.
+    Trailing 'Z' is accepted, result is naive UTC datetime.
+
+    Args:
+        value (Optional[str])
+
+    Raises:
+        ValueError: invalid datetime string
+
+    Returns:
+        Optional[datetime]: None if value is None
+    """
+    if value is None:
+        return None
+    if value.endswith('Z'):
+        value = value[:-1]
+    return datetime.fromisoformat(value)
+
+
+class JSONEncoder(FlaskJSONEncoder):
+    """
+    Flask json encoder. Datetimes are encoded as ISO 8601 strings
+        instead of HTTP dates.
+    """
+
+    def default(self, o: Any) -> Any:
+        try:
+            return default(o)
+        except TypeError:
+            return super().default(o)
+
+
+def output_json(data: Any, code: int, headers: Optional[dict] = None):
+    """
+    flask-restful representation for 'application/json'.
+
+    Args:
+        data (Any): response data
+        code (int): status code
+        headers (Optional[dict], optional): response headers. Defaults to None.
+
+    Returns:
+        flask.Response
+    """
+    response = make_response(dumps(data) + '\n', code)
+    response.headers.extend(headers or {})
+    return response
+
+
+class MsgPackPacket(packet.Packet):
+    """
+    Socket.IO packet serialized with MessagePack.
+    Unlike `socketio.msgpack_packet.MsgPackPacket`, supports datetimes and enumerations.
+    """
+    uses_binary_events = False
+
+    def encode(self) -> bytes:
+        """Encode the packet for transmission."""
+        return msgpack.dumps(self._to_dict(), default=default)
+
+    def decode(self, encoded_packet: bytes) -> NoReturn:
+        """Decode a transmitted package."""
+        decoded = msgpack.loads(encoded_packet)
+        self.packet_type = decoded['type']
+        self.data = decoded['data']
+        self.id = decoded.get('id')
+        self.namespace = decoded['nsp']
@@ -0,0 +1,425 @@
+"""
+This module provides background job runner for deferred work.
+Jobs are JSON encoded {'id', 'name', 'args', 'kwargs', 'attempt'} dicts
+    stored in a queue, and are run by a pool of worker greenlets.
+Defines following classes:
+    - `MemoryJobQueue`, in-process queue used for testing
+    - `RedisJobQueue`, durable Redis queue
+    - `JobRunner`
+
+Defines following functions:
+    - `jobs_command`, 'flask jobs' command group
+"""
+
+import heapq
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, NoReturn, Optional
+
+import click
+from flask import Flask, current_app
+from flask.cli import AppGroup
+from flask_socketio import SocketIO
+from redis import Redis
+
+from shmelegram.utils import encoding
+
+
+JsonDict = dict[str, Any]
+
+
+class MemoryJobQueue:
+    """
+    In-process job queue. Jobs are lost on restart.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready: deque[str] = deque()
+        self._delayed: list[tuple[float, int, str]] = []
+        self._counter = 0
+        self.processing: list[str] = []
+        self.dead: list[str] = []
+
+    def push(self, job: str, delay: float = 0) -> NoReturn:
+        """
+        Add job to the queue.
+
+        Args:
+            job (str): encoded job
+            delay (float, optional): seconds before job is ready. Defaults to 0.
+
+        Returns:
+            NoReturn
+        """
+        with self._lock:
+            if delay > 0:
+                self._counter += 1
+                heapq.heappush(self._delayed, (time.time() + delay, self._counter, job))
+            else:
+                self._ready.append(job)
+
+    def pop(self) -> Optional[str]:
+        """
+        Take ready job from the queue, without waiting.
+        Job stays in processing list until `ack` is called.
+
+        Returns:
+            Optional[str]: encoded job, None if no job is ready
+        """
+        with self._lock:
+            now = time.time()
+            while self._delayed and self._delayed[0][0] <= now:
+                self._ready.append(heapq.heappop(self._delayed)[2])
+            if not self._ready:
+                return None
+            job = self._ready.popleft()
+            self.processing.append(job)
+            return job
+
+    def ack(self, job: str) -> NoReturn:
+        """
+        Remove finished job from processing list.
+
+        Args:
+            job (str): encoded job
+
+        Returns:
+            NoReturn
+        """
+        with self._lock:
+            if job in self.processing:
+                self.processing.remove(job)
+
+    def bury(self, job: str) -> NoReturn:
+        """
+        Add job, that failed every attempt, to dead list.
+
+        Args:
+            job (str): encoded job
+
+        Returns:
+            NoReturn
+        """
+        with self._lock:
+            self.dead.append(job)
+
+    def recover(self) -> int:
+        """
+        Move jobs left in processing list by stopped workers back to the queue.
+
+        Returns:
+            int: number of recovered jobs
+        """
+        with self._lock:
+            recovered = len(self.processing)
+            self._ready.extendleft(reversed(self.processing))
+            self.processing.clear()
+            return recovered
+
+    def sizes(self) -> dict[str, int]:
+        """
+        Get number of jobs by their state.
+
+        Returns:
+            dict[str, int]: 'ready', 'delayed', 'processing' and 'dead' counts
+        """
+        with self._lock:
+            return {
+                'ready': len(self._ready), 'delayed': len(self._delayed),
+                'processing': len(self.processing), 'dead': len(self.dead)
+            }
+
+
+class RedisJobQueue:
+    """
+    Durable Redis job queue.
+    Ready jobs are stored in a list, delayed jobs in a sorted set by due time.
+    Taken jobs are atomically moved to a processing list and stay there
+        until acknowledged, so jobs of crashed workers can be recovered.
+
+    Must use a Redis database that is not flushed on connection,
+        see `RedisClient`.
+    """
+
+    def __init__(self, redis: Redis, prefix: str = 'jobs'):
+        self.redis = redis
+        self.ready_key = f'{prefix}:ready'
+        self.delayed_key = f'{prefix}:delayed'
+        self.processing_key = f'{prefix}:processing'
+        self.dead_key = f'{prefix}:dead'
+
+    def push(self, job: str, delay: float = 0) -> NoReturn:
+        """See `MemoryJobQueue.push`."""
+        if delay > 0:
+            self.redis.zadd(self.delayed_key, {job: time.time() + delay})
+        else:
+            self.redis.lpush(self.ready_key, job)
+
+    def _promote_delayed(self) -> NoReturn:
+        for job in self.redis.zrangebyscore(self.delayed_key, 0, time.time(), 0, 100):
+            # only the worker that removed the job from the set promotes it
+            if self.redis.zrem(self.delayed_key, job):
+                self.redis.lpush(self.ready_key, job)
+
+    def pop(self) -> Optional[str]:
+        """See `MemoryJobQueue.pop`."""
+        self._promote_delayed()
+        job = self.redis.rpoplpush(self.ready_key, self.processing_key)
+        return job.decode('utf-8') if isinstance(job, bytes) else job
+
+    def ack(self, job: str) -> NoReturn:
+        """See `MemoryJobQueue.ack`."""
+        self.redis.lrem(self.processing_key, 1, job)
+
+    def bury(self, job: str) -> NoReturn:
+        """See `MemoryJobQueue.bury`."""
+        self.redis.lpush(self.dead_key, job)
+
+    def recover(self) -> int:
+        """See `MemoryJobQueue.recover`."""
+        recovered = 0
+        while self.redis.rpoplpush(self.processing_key, self.ready_key) is not None:
+            recovered += 1
+        return recovered
+
+    def sizes(self) -> dict[str, int]:
+        """See `MemoryJobQueue.sizes`."""
+        return {
+            'ready': self.redis.llen(self.ready_key),
+            'delayed': self.redis.zcard(self.delayed_key),
+            'processing': self.redis.llen(self.processing_key),
+            'dead': self.redis.llen(self.dead_key)
+        }
+
+
+class JobRunner:
+    """
+    Background job runner.
+    Handlers are registered with `task` decorator and enqueued by name
+        with `enqueue`, which does not wait for the job to be run.
+    Handlers are run in app context by worker greenlets, either started
+        in the web process on first enqueue or by 'flask jobs work' command.
+    Failed jobs are retried with exponential backoff, jobs that failed
+        every attempt are moved to dead list.
+
+    Config values:
+        JOBS_BACKEND (str): 'redis' or 'memory'
+        JOBS_REDIS_URL (str): Redis url for 'redis' backend
+        JOBS_WORKERS (int): number of workers started in the web process,
+            0 means jobs are run only by 'flask jobs work' command
+        JOBS_MAX_RETRIES (int): max number of retries of failed job
+        JOBS_RETRY_BACKOFF (float): delay before the first retry in seconds,
+            doubled on every next retry
+        JOBS_POLL_INTERVAL (float): idle worker queue polling interval in seconds
+    """
+
+    def __init__(self, socketio: SocketIO, app: Optional[Flask] = None):
+        self.socketio = socketio
+        self.app = None
+        self.queue = MemoryJobQueue()
+        self.workers = 0
+        self.max_retries = 3
+        self.retry_backoff = 1.0
+        self.poll_interval = 1.0
+        self.handlers: dict[str, Callable] = {}
+        self.stats = {'succeeded': 0, 'retried': 0, 'failed': 0}
+        self._started = False
+        self._stopping = False
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> NoReturn:
+        """
+        Read job settings from app config, create queue and register cli commands.
+
+        Args:
+            app (Flask)
+
+        Raises:
+            ValueError: unknown backend
+
+        Returns:
+            NoReturn
+        """
+        self.app = app
+        backend = app.config['JOBS_BACKEND']
+        if backend == 'redis':
+            self.queue = RedisJobQueue(Redis.from_url(
+                app.config['JOBS_REDIS_URL'], decode_responses=True
+            ))
+        elif backend == 'memory':
+            self.queue = MemoryJobQueue()
+        else:
+            raise ValueError(f'unknown jobs backend {backend!r}')
+        self.workers = app.config['JOBS_WORKERS']
+        self.max_retries = app.config['JOBS_MAX_RETRIES']
+        self.retry_backoff = app.config['JOBS_RETRY_BACKOFF']
+        self.poll_interval = app.config['JOBS_POLL_INTERVAL']
+        app.extensions['job_runner'] = self
+        app.cli.add_command(jobs_command)
+
+    def task(self, name: Optional[str] = None) -> Callable[[Callable], Callable]:
+        """
+        Decorator registering job handler.
+
+        Args:
+            name (Optional[str], optional): job name. Defaults to function name.
+
+        Returns:
+            Callable[[Callable], Callable]: decorator returning the same function
+        """
+        def decorator(func: Callable) -> Callable:
+            self.handlers[name or func.__name__] = func
+            return func
+        return decorator
+
+    def enqueue(self, name: str, *args, delay: float = 0, **kwargs) -> str:
+        """
+        Enqueue job without waiting for it to be run.
+        Arguments must be JSON serializable.
+
+        Args:
+            name (str): name of registered handler
+            delay (float, optional): seconds before job is run. Defaults to 0.
+
+        Raises:
+            ValueError: no handler with such name
+
+        Returns:
+            str: job id
+        """
+        if name not in self.handlers:
+            raise ValueError(f'unknown job {name!r}')
+        job_id = uuid.uuid4().hex
+        self.queue.push(encoding.dumps({
+            'id': job_id, 'name': name, 'args': args,
+            'kwargs': kwargs, 'attempt': 0
+        }), delay)
+        if self.workers and not self._started:
+            self.start(self.workers)
+        return job_id
+
+    def start(self, workers: int) -> NoReturn:
+        """
+        Start worker greenlets in background.
+
+        Args:
+            workers (int): number of workers
+
+        Returns:
+            NoReturn
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._stopping = False
+        for _ in range(workers):
+            self.socketio.start_background_task(self._work)
+
+    def stop(self) -> NoReturn:
+        """
+        Ask workers to stop after finishing their current jobs.
+
+        Returns:
+            NoReturn
+        """
+        self._stopping = True
+        self._started = False
+
+    def _work(self) -> NoReturn:
+        while not self._stopping:
+            if not self.run_once():
+                self.socketio.sleep(self.poll_interval)
+
+    def run_once(self) -> bool:
+        """
+        Run one ready job, if there is any.
+
+        Returns:
+            bool: whether a job was run
+        """
+        job = self.queue.pop()
+        if job is None:
+            return False
+        try:
+            data = encoding.loads(job)
+            with self.app.app_context():
+                self._run(data)
+        finally:
+            self.queue.ack(job)
+        return True
+
+    def run_pending(self) -> int:
+        """
+        Run ready jobs until queue is empty, in the current greenlet.
+        Retries are run only if they become ready meanwhile.
+
+        Returns:
+            int: number of run jobs
+        """
+        count = 0
+        while self.run_once():
+            count += 1
+        return count
+
+    def _run(self, data: JsonDict) -> NoReturn:
+        handler = self.handlers.get(data['name'])
+        try:
+            if handler is None:
+                raise ValueError(f"unknown job {data['name']!r}")
+            handler(*data['args'], **data['kwargs'])
+        except Exception:  # pylint: disable=broad-except
+            data['attempt'] += 1
+            if handler is not None and data['attempt'] <= self.max_retries:
+                delay = self.retry_backoff * 2 ** (data['attempt'] - 1)
+                current_app.logger.warning(
+                    'job %s %s failed, retry %s in %.1fs', data['name'], data['id'],
+                    data['attempt'], delay, exc_info=True
+                )
+                self.stats['retried'] += 1
+                self.queue.push(encoding.dumps(data), delay)
+            else:
+                current_app.logger.exception(
+                    'job %s %s failed', data['name'], data['id']
+                )
+                self.stats['failed'] += 1
+                self.queue.bury(encoding.dumps(data))
+        else:
+            self.stats['succeeded'] += 1
+
+
+jobs_command = AppGroup('jobs', help='Manage background jobs.')
+
+
+@jobs_command.command('work')
+@click.option('--workers', default=4, show_default=True, help='Number of workers.')
+@click.option('--burst', is_flag=True, help='Exit when queue is empty.')
+@click.option('--recover', is_flag=True, help='Requeue jobs of crashed workers first.')
+def work_command(workers: int, burst: bool, recover: bool):
+    """Run job workers."""
+    runner: JobRunner = current_app.extensions['job_runner']
+    if recover:
+        click.echo(f'{runner.queue.recover()} jobs recovered')
+    if burst:
+        click.echo(f'{runner.run_pending()} jobs run')
+        return
+    click.echo(f'starting {workers} workers')
+    runner.start(workers)
+    try:
+        while True:
+            runner.socketio.sleep(60)
+    except KeyboardInterrupt:
+        runner.stop()
+
+
+@jobs_command.command('status')
+def status_command():
+    """Show number of jobs by state."""
+    runner: JobRunner = current_app.extensions['job_runner']
+    for state, count in runner.queue.sizes().items():
+        click.echo(f'{state}: {count}')
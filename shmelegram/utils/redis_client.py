@@ -2,9 +2,11 @@
 This modules provides custom RedisClient
 Defines following classes:
     - `RedisClient`
+    - `FakeRedisClient`
 """
 
-from typing import NoReturn, Any
+import time
+from typing import NoReturn, Any, Optional, Set
 
 from redis import Redis
 
@@ -14,72 +16,165 @@ class RedisClient(Redis):
 
     """
     Custom Redis client.
-    Every connection and disconnection flushes all db data.
-    (See redis's `flushdb` command).
+    Database is shared by all nodes, so it is never flushed. Keys of
+        a node are removed by `ConnectionRegistry` node-scoped cleanup.
     """
 
-    def __init__(self, *args, **kwargs) -> NoReturn:
-        super().__init__(*args, **kwargs)
-        self.flushdb(asynchronous=True)
-
-    def close(self) -> NoReturn:
-        """
-        Overrides close function.
-        Before close flushes database data asyncronosly.
-
-        Returns:
-            NoReturn
-        """
-        self.flushdb(asynchronous=True)
-        super().close()
-
 
 class FakeRedisClient:
     """
-    Fake Redis Client. Values are converted and stored as strings.
+    Fake Redis Client. Values are converted and stored as strings,
+        sets are stored as sets of strings. Key expiration is supported.
     """
 
     def __init__(self, *args, **kwargs):
         # pylint: disable=unused-argument
         self._data = {}
+        self._expires = {}
+
+    def _check_expired(self, key: str) -> NoReturn:
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            del self._expires[key]
 
-    def get(self, key: str) -> str:
+    def get(self, key: str) -> Optional[str]:
         """
         Get value by key. Since values converted into strings, returns string.
 
         Args:
             key (str)
 
-        Raises:
-            KeyError: if no such key found
-
         Returns:
-            str
+            Optional[str]: None if no such key found
         """
-        return self._data[key]
+        self._check_expired(key)
+        return self._data.get(key)
 
-    def set(self, key: str, value: Any) -> NoReturn:
+    def set(self, key: str, value: Any, ex: Optional[int] = None) -> NoReturn:
         """
         Set key-value pair. Value is converted and stored as string.
 
         Args:
             key (str)
             value (Any)
+            ex (Optional[int], optional): expiration in seconds. Defaults to None.
 
         Returns:
             NoReturn
         """
         self._data[key] = str(value)
+        self._expires.pop(key, None)
+        if ex is not None:
+            self.expire(key, ex)
 
-    def delete(self, *args: str) -> NoReturn:
+    def delete(self, *args: str) -> int:
         """
-        Delete all values by given keys.
+        Delete all values by given keys. Missing keys are ignored.
 
-        Raises:
-            KeyError: if at least one key is not present
+        Returns:
+            int: number of deleted keys
+        """
+        deleted = 0
+        for key in args:
+            self._check_expired(key)
+            self._expires.pop(key, None)
+            deleted += self._data.pop(key, None) is not None
+        return deleted
+
+    def exists(self, *args: str) -> int:
+        """
+        Count existing keys among given ones.
 
         Returns:
-            NoReturn
+            int
         """
         for key in args:
-            del self._data[key]
+            self._check_expired(key)
+        return sum(key in self._data for key in args)
+
+    def expire(self, key: str, seconds: int) -> bool:
+        """
+        Set key expiration.
+
+        Args:
+            key (str)
+            seconds (int)
+
+        Returns:
+            bool: whether key exists
+        """
+        self._check_expired(key)
+        if key not in self._data:
+            return False
+        self._expires[key] = time.monotonic() + seconds
+        return True
+
+    def sadd(self, key: str, *values: Any) -> int:
+        """
+        Add values to set stored by key.
+
+        Args:
+            key (str)
+
+        Returns:
+            int: number of added values
+        """
+        self._check_expired(key)
+        members = self._data.setdefault(key, set())
+        added = {str(value) for value in values} - members
+        members.update(added)
+        return len(added)
+
+    def srem(self, key: str, *values: Any) -> int:
+        """
+        Remove values from set stored by key. Empty set is deleted.
+
+        Args:
+            key (str)
+
+        Returns:
+            int: number of removed values
+        """
+        members = self.smembers(key)
+        removed = {str(value) for value in values} & members
+        if key in self._data:
+            self._data[key] -= removed
+            if not self._data[key]:
+                self.delete(key)
+        return len(removed)
+
+    def smembers(self, key: str) -> Set[str]:
+        """
+        Get values of set stored by key.
+
+        Args:
+            key (str)
+
+        Returns:
+            set[str]: empty set if no such key found
+        """
+        self._check_expired(key)
+        return set(self._data.get(key, set()))
+
+    def pipeline(self, transaction: bool = True) -> 'FakeRedisClient':
+        """
+        Return client itself, commands are executed immediately.
+
+        Args:
+            transaction (bool, optional): ignored. Defaults to True.
+
+        Returns:
+            FakeRedisClient
+        """
+        # pylint: disable=unused-argument
+        return self
+
+    def execute(self) -> NoReturn:
+        """Pipeline execution, does nothing."""
+
+    def __enter__(self) -> 'FakeRedisClient':
+        return self
+
+    def __exit__(self, *args) -> NoReturn:
+        pass
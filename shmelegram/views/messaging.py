@@ -1,7 +1,14 @@
 """
 This module contains socketio event handlers for chat functioning.
 All client-to-server events have the same name as function handler names.
+Server-to-client events are emitted through `event_coalescer`, so they can be
+    delivered merged into a single 'batch' event (see `EventCoalescer`).
+Every server-to-client event, except for user status updates, is also recorded
+    in update logs of its recipients (see `UpdateService`), so clients can
+    fetch missed events with 'sync' event after reconnection.
 Defines following functions:
+    - `broadcast`, record and emit event to chat members
+    - `notify`, record and emit event to single user
     - `edit_message`
     - `delete_message`
     - `add_view`
@@ -14,24 +21,63 @@ Defines following functions:
     - `create_group`
     - `create_private`
     - `send_message` ('message' event)
+    - `batch`
+    - `sync`
 """
 
+from collections import defaultdict
 from datetime import datetime
-from typing import Any
+from typing import Any, Iterable, Optional, Union
 
 from flask import request
-from flask_socketio import emit, join_room, leave_room, send, close_room
+from flask_socketio import join_room, leave_room, close_room
 from sqlalchemy.orm import load_only
 
-from shmelegram import socketio, redis_client
+from shmelegram import db, socketio, connections, event_coalescer, chat_purger
 from shmelegram.config import ChatKind
 from shmelegram.models import Chat, Message, User
-from shmelegram.service import UserService, ChatService, MessageService
+from shmelegram.service import UserService, ChatService, MessageService, UpdateService
+from shmelegram.utils.encoding import parse_datetime
 
 
 JsonDict = dict[str, Any]
 
 
+def broadcast(
+    event: str, data: JsonDict, chat_id: int,
+    skip_sid: Union[str, list[str], None] = None, skip_user_id: Optional[int] = None
+):
+    """
+    Record event in update logs of chat members and emit it to chat room.
+
+    Args:
+        event (str): event name
+        data (JsonDict): event data
+        chat_id (int): chat whose members receive the event
+        skip_sid (Union[str, list[str], None], optional): sids not receiving the event.
+            Defaults to None.
+        skip_user_id (Optional[int], optional): user whose update log does not
+            record the event. Defaults to None.
+    """
+    UpdateService.record(event, data, chat_id=chat_id, skip_user_id=skip_user_id)
+    event_coalescer.emit(event, data, to=chat_id, skip_sid=skip_sid)
+
+
+def notify(event: str, data: JsonDict, user_id: int, sids: Iterable[str]):
+    """
+    Record event in update log of user and emit it to user's clients.
+
+    Args:
+        event (str): event name
+        data (JsonDict): event data
+        user_id (int): user receiving the event
+        sids (Iterable[str]): sids of user's clients, empty if user is offline
+    """
+    UpdateService.record(event, data, user_ids=[user_id])
+    for sid in sids:
+        event_coalescer.emit(event, data, to=sid)
+
+
 @socketio.event
 def edit_message(data: JsonDict):
     """
@@ -46,16 +92,13 @@ def edit_message(data: JsonDict):
         data (JsonDict)
     """
     message = Message.get(data['message_id'])
-    if int(redis_client.get(request.sid)) != message.from_user.id:
+    if connections.get_user_id(request.sid) != message.from_user.id:
         return
-    edited_at = datetime.strptime(data['edited_at'], "%Y-%m-%dT%H:%M:%S")
+    edited_at = parse_datetime(data['edited_at'])
     message.text = data['text']
     message.edited_at = edited_at
     message.save()
-    emit(
-        'edit_message', data | {"chat_id": message.chat.id},
-        to=message.chat.id
-    )
+    broadcast('edit_message', data | {"chat_id": message.chat.id}, message.chat.id)
 
 
 @socketio.event
@@ -73,7 +116,7 @@ def delete_message(data: JsonDict):
     message = Message.get(message_id)
     data['chat_id'] = message.chat.id
     message.delete()
-    emit('delete_message', data, to=message.chat.id)
+    broadcast('delete_message', data, message.chat.id)
 
 
 @socketio.event
@@ -89,13 +132,13 @@ def add_view(data: JsonDict):
         data (JsonDict)
     """
     message_id = data['message_id']
-    user = User.get(int(redis_client.get(request.sid)))
+    user = User.get(connections.get_user_id(request.sid))
     message = Message.get(message_id)
     message.add_view(user)
     message.save()
-    emit(
+    broadcast(
         'update_view', data | {'chat_id': message.chat.id, 'user_id': user.id},
-        to=message.chat.id
+        message.chat.id
     )
 
 
@@ -108,11 +151,11 @@ def is_offline():
     Emits global 'update_user_status' event with 'user_id' (int) of user
         and 'last_online' (datetime to str).
     """
-    user = User.get(int(redis_client.get(request.sid)))
+    user = User.get(connections.get_user_id(request.sid))
     user.last_online = datetime.utcnow()
     user.save()
-    socketio.emit('update_user_status', {
-        'user_id': user.id, 'last_online': user.last_online.strftime("%Y-%m-%dT%H:%M:%S")
+    event_coalescer.emit('update_user_status', {
+        'user_id': user.id, 'last_online': user.last_online
     })
 
 
@@ -125,10 +168,10 @@ def is_online():
     Emits global 'update_user_status' event with 'user_id' (int) of user
         and 'last_online' (None).
     """
-    user = User.get(int(redis_client.get(request.sid)))
+    user = User.get(connections.get_user_id(request.sid))
     user.last_online = None
     user.save()
-    socketio.emit('update_user_status', {
+    event_coalescer.emit('update_user_status', {
         'user_id': user.id, 'last_online': None
     })
 
@@ -144,8 +187,7 @@ def connect():
     user = User.get(user_id)
     for chat in user.chats.options(load_only("id")).all():
         join_room(chat.id)
-    redis_client.set(request.sid, user_id)
-    redis_client.set(user_id, request.sid)
+    connections.add(request.sid, user.id)
     is_online()
 
 
@@ -156,9 +198,8 @@ def disconnect():
     User id is retrieved via Redis.
     Accepts no args.
     """
-    user_id = redis_client.get(request.sid)
     is_offline()
-    redis_client.delete(request.sid, user_id)
+    connections.remove(request.sid)
 
 
 @socketio.event
@@ -177,9 +218,9 @@ def join_chat(data: JsonDict):
     """
     chat_id = data['chat_id']
     user = User.get(
-        data.get('user_id') or int(redis_client.get(request.sid))
+        data.get('user_id') or connections.get_user_id(request.sid)
     )
-    sid = redis_client.get(user.id)
+    sids = list(connections.get_sids(user.id))
     chat = Chat.get(chat_id)
     chat.add_member(user)
     chat.save()
@@ -188,13 +229,16 @@ def join_chat(data: JsonDict):
         text=f"{user.username} joined the group"
     )
     message.save()
-    emit(
+    broadcast(
         'add_member', {'user': UserService.to_json(user), 'chat_id': chat_id},
-        to=chat_id, skip_sid=sid
+        chat_id, skip_sid=sids, skip_user_id=user.id
+    )
+    broadcast(
+        'message', MessageService.to_json(message), chat_id, skip_user_id=user.id
     )
-    send(MessageService.to_json(message), to=chat_id)
-    emit('add_chat', ChatService.to_json(chat), to=sid)
-    join_room(chat_id, sid=sid)
+    notify('add_chat', ChatService.to_json(chat), user.id, sids)
+    for sid in sids:
+        join_room(chat_id, sid=sid)
 
 
 @socketio.event
@@ -203,7 +247,8 @@ def leave_chat(data: JsonDict):
     Leave chat event handler.
     User id is retrieved either by Redis through `request.sid` or by 'user_id' `data` key.
     Accepts data dict containing 'chat_id' (int) and 'user_id' (int, optional).
-    If chat is private or chat member count is less than 1, chat is deleted.
+    If chat is private or chat member count is less than 1, chat is marked as deleted
+        and purged in background (see `ChatPurger`).
     Emits:
         'remove_member` for chat members with 'user' (JsonDict) and 'chat_id' (int) data;
         'message' for chat members;
@@ -214,28 +259,29 @@ def leave_chat(data: JsonDict):
     """
     chat_id = data['chat_id']
     user = User.get(
-        data.get('user_id') or int(redis_client.get(request.sid))
+        data.get('user_id') or connections.get_user_id(request.sid)
     )
     chat = Chat.get(chat_id)
     chat.remove_member(user)
     chat.save()
     leave_room(chat_id)
-    emit('remove_chat', {'chat_id': chat_id}, to=request.sid)
+    notify('remove_chat', {'chat_id': chat_id}, user.id, connections.get_sids(user.id))
     if chat.kind is not ChatKind.PRIVATE and chat.member_count:
         message = Message(
             chat=chat, from_user=user, is_service=True,
             text=f"{user.username} left the group"
         )
         message.save()
-        emit(
+        broadcast(
             'remove_member', {'user_id': user.id, 'chat_id': chat.id},
-            to=chat_id, skip_sid=request.sid
+            chat_id, skip_sid=request.sid
         )
-        send(MessageService.to_json(message), to=chat_id)
+        broadcast('message', MessageService.to_json(message), chat_id)
     else:
-        emit('remove_chat', {'chat_id': chat_id}, to=chat_id, skip_sid=request.sid)
+        broadcast('remove_chat', {'chat_id': chat_id}, chat_id, skip_sid=request.sid)
         close_room(chat_id)
-        chat.delete()
+        chat.mark_deleted()
+        chat_purger.schedule()
 
 
 @socketio.event
@@ -251,7 +297,7 @@ def create_group(data: JsonDict):
     """
     title = data['title']
     chat = Chat(kind=ChatKind.GROUP, title=title)
-    user = User.get(int(redis_client.get(request.sid)))
+    user = User.get(connections.get_user_id(request.sid))
     chat.save()
     chat.add_member(user)
     message = Message(
@@ -261,7 +307,7 @@ def create_group(data: JsonDict):
     message.save()
     chat.save()
     join_room(chat.id)
-    emit('add_chat', ChatService.to_json(chat), to=chat.id)
+    broadcast('add_chat', ChatService.to_json(chat), chat.id)
 
 
 @socketio.event
@@ -277,7 +323,7 @@ def create_private(data: JsonDict):
     """
     chat = Chat(kind=ChatKind.PRIVATE)
     users = User.get(int(data['user_id'])), User.get(
-        int(redis_client.get(request.sid))
+        connections.get_user_id(request.sid)
     )
     chat.save()
     for user in users:
@@ -289,8 +335,9 @@ def create_private(data: JsonDict):
     message.save()
     chat.save()
     for user in users:
-        join_room(chat.id, sid=redis_client.get(user.id))
-    emit('add_chat', ChatService.to_json(chat), to=chat.id)
+        for sid in connections.get_sids(user.id):
+            join_room(chat.id, sid=sid)
+    broadcast('add_chat', ChatService.to_json(chat), chat.id)
 
 
 @socketio.on('message')
@@ -311,8 +358,8 @@ def send_message(data: JsonDict):
         data (JsonDict)
     """
     chat = Chat.get(data['chat_id'])
-    user = User.get(int(redis_client.get(request.sid)))
-    created_at = datetime.strptime(data['created_at'], '%Y-%m-%dT%H:%M:%S')
+    user = User.get(connections.get_user_id(request.sid))
+    created_at = parse_datetime(data['created_at'])
     reply_to = Message.get_or_none(data.get('reply_to'))
     message = Message(
         chat=chat, from_user=user,
@@ -322,4 +369,103 @@ def send_message(data: JsonDict):
     message.save()
     message.add_view(user)
     message.save()
-    send(MessageService.to_json(message), to=chat.id)
+    broadcast('message', MessageService.to_json(message), chat.id)
+
+
+BATCH_EVENTS = ('add_view', 'delete_message', 'edit_message')
+
+
+@socketio.event
+def batch(data: list[JsonDict]) -> list[JsonDict]:
+    """
+    Batch event handler.
+    User id is retrieved via Redis through `request.sid` once for all operations.
+    Accepts a list of operation dicts containing 'event' (str) and 'data' (JsonDict),
+        where event is one of `BATCH_EVENTS` and data is the same as for the
+        event's own handler.
+    Operations are run in one transaction with bulk SQL statements.
+    Only messages of chats the user is member of can be processed,
+        only own messages can be edited.
+    Emits events of the same format as the single event handlers,
+        grouped into one 'batch' event per chat, and records them
+        in update logs of chat members in the same transaction.
+
+    Args:
+        data (list[JsonDict])
+
+    Returns:
+        list[JsonDict]: acknowledgement, list of {'ok': bool, 'error': str (if not ok)}
+            for every operation in the same order
+    """
+    user_id = connections.get_user_id(request.sid)
+    results = [{'ok': True} for _ in data]
+    views, edits, deletions = {}, {}, {}
+    broadcasts = defaultdict(list)
+    with db.session.begin():
+        messages = MessageService.get_member_messages(user_id, (
+            operation.get('data', {}).get('message_id') for operation in data
+        ))
+        for index, operation in enumerate(data):
+            event, event_data = operation.get('event'), operation.get('data', {})
+            message = messages.get(event_data.get('message_id'))
+            if event not in BATCH_EVENTS:
+                results[index] = {'ok': False, 'error': 'unknown event'}
+            elif message is None:
+                results[index] = {'ok': False, 'error': 'message does not exist'}
+            elif event == 'add_view':
+                views[message.id] = message
+            elif event == 'delete_message':
+                deletions[message.id] = message
+            elif message.from_user_id != user_id:
+                results[index] = {'ok': False, 'error': 'not allowed'}
+            else:
+                try:
+                    edited_at = parse_datetime(event_data['edited_at'])
+                    edits[message.id] = event_data['text'], edited_at, event_data
+                except (KeyError, TypeError, ValueError):
+                    results[index] = {'ok': False, 'error': 'invalid data'}
+        MessageService.edit_messages(
+            (id_, text, edited_at) for id_, (text, edited_at, _) in edits.items()
+            if id_ not in deletions
+        )
+        for id_ in MessageService.add_views(user_id, views.keys() - deletions.keys()):
+            broadcasts[views[id_].chat_id].append({'event': 'update_view', 'data': {
+                'message_id': id_, 'chat_id': views[id_].chat_id, 'user_id': user_id
+            }})
+        for id_, (_, _, event_data) in edits.items():
+            if id_ not in deletions:
+                chat_id = messages[id_].chat_id
+                broadcasts[chat_id].append({
+                    'event': 'edit_message', 'data': event_data | {'chat_id': chat_id}
+                })
+        for id_, message in deletions.items():
+            broadcasts[message.chat_id].append({'event': 'delete_message', 'data': {
+                'message_id': id_, 'chat_id': message.chat_id
+            }})
+        MessageService.delete_messages(deletions)
+        for chat_id, events in broadcasts.items():
+            UpdateService.record_many(events, chat_id=chat_id)
+    for chat_id, events in broadcasts.items():
+        event_coalescer.emit_many(events, to=chat_id)
+    return results
+
+
+@socketio.event
+def sync(data: JsonDict) -> JsonDict:
+    """
+    Sync event handler, used by clients to fetch events missed while reconnecting.
+    User id is retrieved via Redis through `request.sid`.
+    Accepts data dict containing 'offset' (int), id of the last received update,
+        and 'limit' (int, optional).
+    See `UpdateService.get_updates`.
+
+    Args:
+        data (JsonDict)
+
+    Returns:
+        JsonDict: acknowledgement, {'updates': list[JsonDict], 'offset': int, 'gap': bool}
+    """
+    user_id = connections.get_user_id(request.sid)
+    return UpdateService.get_updates(
+        user_id, int(data.get('offset', 0)), data.get('limit')
+    )
@@ -0,0 +1,228 @@
+# pylint: disable=missing-function-docstring, missing-module-docstring
+# pylint: disable=missing-class-docstring, invalid-name, unused-argument
+
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from shmelegram import app, db, socketio, chat_purger, job_runner
+from shmelegram.utils.jobs import MemoryJobQueue
+from shmelegram.config import ChatKind
+from shmelegram.models import Chat, User, Message, UserUpdate, message_view
+from shmelegram.service import ChatService, UpdateService
+
+
+class MessagingTestBase(unittest.TestCase):
+    def setUp(self):
+        db.session = db.create_scoped_session(options={'autocommit': True})
+        db.create_all()
+        self.user = User(username='admin', password='TesT123.-wow')
+        self.other = User(username='other', password='TesT123.-wow')
+        self.chat = Chat(kind=ChatKind.GROUP, title='some title')
+        self.chat.add_member(self.user)
+        self.chat.add_member(self.other)
+        self.foreign_chat = Chat(kind=ChatKind.GROUP, title='foreign')
+        self.foreign_chat.add_member(self.other)
+        db.session.add_all([self.user, self.other, self.chat, self.foreign_chat])
+        db.session.flush()
+        self.user_id, self.other_id = self.user.id, self.other.id
+        self.chat_id = self.chat.id
+        self.client = socketio.test_client(
+            app, query_string=f'user_id={self.user.id}'
+        )
+        self.client.get_received()
+
+    def tearDown(self):
+        self.client.disconnect()
+        db.drop_all()
+
+    def create_message(self, chat: Chat, user: User, text: str = 'text') -> Message:
+        message = Message(chat=chat, from_user=user, text=text)
+        message.save()
+        return message
+
+
+class BatchTestCase(MessagingTestBase):
+    def test_batch(self):
+        own = self.create_message(self.chat, self.user)
+        other = self.create_message(self.chat, self.other)
+        foreign = self.create_message(self.foreign_chat, self.other)
+        deleted = self.create_message(self.chat, self.other)
+        ids = own.id, other.id, foreign.id, deleted.id
+        results = self.client.emit('batch', [
+            {'event': 'add_view', 'data': {'message_id': own.id}},
+            {'event': 'add_view', 'data': {'message_id': other.id}},
+            {'event': 'add_view', 'data': {'message_id': foreign.id}},
+            {'event': 'edit_message', 'data': {
+                'message_id': own.id, 'text': 'new', 'edited_at': '2022-01-01T00:00:00'
+            }},
+            {'event': 'edit_message', 'data': {
+                'message_id': other.id, 'text': 'new', 'edited_at': '2022-01-01T00:00:00'
+            }},
+            {'event': 'delete_message', 'data': {'message_id': deleted.id}},
+            {'event': 'random', 'data': {'message_id': own.id}},
+        ], callback=True)
+        self.assertEqual([x['ok'] for x in results], [
+            True, True, False, True, False, True, False
+        ])
+        own, other, foreign, deleted = (Message.get_or_none(x) for x in ids)
+        self.assertIsNone(deleted)
+        self.assertEqual(own.text, 'new')
+        self.assertEqual(other.text, 'text')
+        self.assertEqual([x.id for x in other.seen_by], [self.user_id])
+        self.assertEqual(foreign.seen_by.count(), 0)
+        received = self.client.get_received()
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0]['name'], 'batch')
+        self.assertEqual([x['event'] for x in received[0]['args'][0]], [
+            'update_view', 'update_view', 'edit_message', 'delete_message'
+        ])
+
+    def test_repeated_view(self):
+        message_id = self.create_message(self.chat, self.other).id
+        operations = [{'event': 'add_view', 'data': {'message_id': message_id}}]
+        self.client.emit('batch', operations, callback=True)
+        self.client.get_received()
+        self.assertEqual(
+            self.client.emit('batch', operations, callback=True), [{'ok': True}]
+        )
+        self.assertEqual(Message.get(message_id).seen_by.count(), 1)
+        self.assertEqual(self.client.get_received(), [])
+
+
+class UpdateLogTestCase(MessagingTestBase):
+    def setUp(self):
+        super().setUp()
+        self.context = app.app_context()
+        self.context.push()
+
+    def tearDown(self):
+        self.context.pop()
+        super().tearDown()
+
+    def test_sync(self):
+        offset = self.client.emit('sync', {'offset': -1}, callback=True)['offset']
+        self.client.emit('message', {
+            'chat_id': self.chat_id, 'text': 'hi', 'created_at': '2022-01-01T00:00:00'
+        })
+        self.client.emit('create_group', {'title': 'new group'})
+        result = self.client.emit('sync', {'offset': offset}, callback=True)
+        self.assertFalse(result['gap'])
+        self.assertEqual(
+            [x['event'] for x in result['updates']], ['message', 'add_chat']
+        )
+        self.assertEqual(result['updates'][0]['data']['text'], 'hi')
+        self.assertEqual(result['offset'], result['updates'][-1]['id'])
+        other_updates = UpdateService.get_updates(self.other_id)['updates']
+        self.assertEqual([x['event'] for x in other_updates], ['message'])
+        self.assertEqual(self.client.emit(
+            'sync', {'offset': result['offset']}, callback=True
+        )['updates'], [])
+
+    def test_batch_recorded(self):
+        message_id = self.create_message(self.chat, self.other).id
+        self.client.emit('batch', [
+            {'event': 'add_view', 'data': {'message_id': message_id}}
+        ], callback=True)
+        updates = UpdateService.get_updates(self.other_id)['updates']
+        self.assertEqual([x['event'] for x in updates], ['update_view'])
+        self.assertEqual(updates[0]['data']['user_id'], self.user_id)
+
+    def test_gap(self):
+        self.client.emit('message', {
+            'chat_id': self.chat_id, 'text': 'hi', 'created_at': '2022-01-01T00:00:00'
+        })
+        offset = UpdateService.get_updates(self.user_id, -1)['offset']
+        UserUpdate.query.update({
+            'created_at': datetime.utcnow() - timedelta(
+                seconds=app.config['UPDATE_LOG_RETENTION'] + 1
+            )
+        })
+        self.assertEqual(UpdateService.prune(), 2)
+        self.assertTrue(UpdateService.get_updates(self.user_id, offset)['gap'])
+        self.assertFalse(UpdateService.get_updates(self.user_id, 0)['gap'])
+
+    def test_rest_long_polling(self):
+        self.client.emit('message', {
+            'chat_id': self.chat_id, 'text': 'hi', 'created_at': '2022-01-01T00:00:00'
+        })
+        with app.test_client() as client:
+            response = client.get(f'/api/users/{self.other_id}/updates?offset=0')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json['updates']), 1)
+            offset = response.json['offset']
+            response = client.get(
+                f'/api/users/{self.other_id}/updates?offset={offset}&timeout=0.1'
+            )
+            self.assertEqual(response.json['updates'], [])
+            self.assertEqual(response.json['offset'], offset)
+            self.assertEqual(client.get('/api/users/0/updates').status_code, 404)
+
+
+class ChatPurgeTestCase(MessagingTestBase):
+    def setUp(self):
+        super().setUp()
+        private = Chat(kind=ChatKind.PRIVATE)
+        private.add_member(User.get(self.user_id))
+        private.add_member(User.get(self.other_id))
+        private.save()
+        for i in range(5):
+            message = self.create_message(private, User.get(self.other_id), str(i))
+            message.add_view(User.get(self.other_id))
+            message.save()
+        self.private_id = private.id
+        job_runner.queue = MemoryJobQueue()
+        self.context = app.app_context()
+        self.context.push()
+
+    def tearDown(self):
+        self.context.pop()
+        chat_purger.batch_size = app.config['CHAT_PURGE_BATCH_SIZE']
+        super().tearDown()
+
+    def count(self, table) -> int:
+        return db.session.execute(select(func.count()).select_from(table)).scalar()
+
+    def test_leave_marks_deleted(self):
+        self.client.emit('leave_chat', {'chat_id': self.private_id})
+        self.assertIsNone(Chat.get_or_none(self.private_id))
+        self.assertFalse(Chat.exists(self.private_id))
+        chat = Chat.query.get(self.private_id)
+        self.assertTrue(chat.is_deleted)
+        self.assertEqual(chat.members, [])
+        self.assertEqual(chat.messages.count(), 5)
+        self.assertEqual(
+            ChatService.get_purge_backlog(), {'chats': 1, 'messages': 5}
+        )
+
+    def test_purge_job(self):
+        self.client.emit('leave_chat', {'chat_id': self.private_id})
+        self.assertEqual(job_runner.run_pending(), 1)
+        self.assertIsNone(Chat.query.get(self.private_id))
+        self.assertEqual(self.count(Message.__table__), 0)
+
+    def test_purge(self):
+        self.client.emit('leave_chat', {'chat_id': self.private_id})
+        chat_purger.batch_size = 2
+        batches = []
+        self.assertEqual(
+            chat_purger.run(progress=lambda chat_id, batch: batches.append(batch)), 1
+        )
+        self.assertEqual([x['messages'] for x in batches], [2, 2, 1])
+        self.assertEqual(sum(x['views'] for x in batches), 5)
+        self.assertIsNone(Chat.query.get(self.private_id))
+        self.assertEqual(self.count(Message.__table__), 0)
+        self.assertEqual(self.count(message_view), 0)
+        self.assertEqual(
+            ChatService.get_purge_backlog(), {'chats': 0, 'messages': 0}
+        )
+
+    def test_purge_command(self):
+        self.client.emit('leave_chat', {'chat_id': self.private_id})
+        runner = app.test_cli_runner()
+        result = runner.invoke(args=['purge-chats', '--status'])
+        self.assertIn('1 deleted chats, 5 messages to purge', result.output)
+        result = runner.invoke(args=['purge-chats'])
+        self.assertIn('1 chats purged', result.output)
+        self.assertEqual(self.count(Message.__table__), 0)
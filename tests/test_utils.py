@@ -0,0 +1,195 @@
+# pylint: disable=missing-function-docstring, missing-module-docstring
+# pylint: disable=missing-class-docstring, invalid-name, unused-argument
+
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from parameterized import parameterized
+from socketio import packet
+
+from shmelegram import app
+from shmelegram.config import ChatKind
+from shmelegram.utils import encoding
+from shmelegram.utils.broadcast import PreEncodedManager
+from shmelegram.utils.coalescer import EventCoalescer
+from shmelegram.utils.jobs import JobRunner, MemoryJobQueue
+
+
+class PreEncodedManagerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = MagicMock()
+        self.server.packet_class = packet.Packet
+        self.manager = PreEncodedManager()
+        self.manager.set_server(self.server)
+        for i in range(3):
+            self.manager.enter_room(f'sid{i}', '/', None, eio_sid=f'eio{i}')
+            self.manager.enter_room(f'sid{i}', '/', 1, eio_sid=f'eio{i}')
+
+    def test_encodes_once_per_broadcast(self):
+        with patch.object(
+            packet.Packet, 'encode', autospec=True, side_effect=packet.Packet.encode
+        ) as encode:
+            self.manager.emit('message', {'id': 1}, '/', room=1, skip_sid='sid0')
+            sent = self.server._send_packet.call_args_list
+            self.assertEqual([x.args[0] for x in sent], ['eio1', 'eio2'])
+            self.assertEqual([x.args[1].encode() for x in sent], [
+                '2["message",{"id":1}]', '2["message",{"id":1}]'
+            ])
+            encode.assert_called_once()
+
+    def test_empty_room_is_not_encoded(self):
+        self.manager.emit('message', {'id': 1}, '/', room=2)
+        self.server._send_packet.assert_not_called()
+
+    def test_callback_is_delegated(self):
+        self.manager.emit('message', {'id': 1}, '/', room=1, callback=print)
+        self.assertEqual(self.server._emit_internal.call_count, 3)
+
+
+class EncodingTestCase(unittest.TestCase):
+    def tearDown(self):
+        encoding.configure()
+
+    @parameterized.expand([
+        (backend, ) for backend in ('stdlib', 'orjson')
+        if backend == 'stdlib' or encoding.orjson is not None
+    ])
+    def test_dumps(self, backend: str):
+        encoding.configure(backend)
+        self.assertEqual(encoding.dumps({
+            'created_at': datetime(2022, 1, 2, 3, 4, 5),
+            'kind': ChatKind.GROUP, 'ids': [1, None]
+        }), '{"created_at":"2022-01-02T03:04:05","kind":50,"ids":[1,null]}')
+        self.assertEqual(encoding.loads('{"a":[1,"b"]}'), {'a': [1, 'b']})
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            encoding.configure('random')
+
+    @parameterized.expand([
+        ('2022-01-02T03:04:05', datetime(2022, 1, 2, 3, 4, 5)),
+        ('2022-01-02T03:04:05.000123Z', datetime(2022, 1, 2, 3, 4, 5, 123)),
+        (None, None),
+    ])
+    def test_parse_datetime(self, value: str, expected: datetime):
+        self.assertEqual(encoding.parse_datetime(value), expected)
+
+
+class EventCoalescerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.socketio = MagicMock()
+        self.coalescer = EventCoalescer(self.socketio)
+        self.coalescer.window, self.coalescer.max_batch = 0.01, 10
+
+    def test_disabled(self):
+        self.coalescer.window = 0
+        self.coalescer.emit('message', {'id': 1}, to=1)
+        self.socketio.emit.assert_called_once_with(
+            'message', {'id': 1}, to=1, skip_sid=None
+        )
+        self.socketio.start_background_task.assert_not_called()
+
+    def test_merge(self):
+        for user_id in (1, 2, 2, 3):
+            self.coalescer.emit('update_view', {
+                'message_id': 5, 'chat_id': 1, 'user_id': user_id
+            }, to=1)
+        self.coalescer.emit('edit_message', {'message_id': 5, 'text': 'a'}, to=1)
+        self.coalescer.emit('edit_message', {'message_id': 5, 'text': 'b'}, to=1)
+        self.coalescer.emit('update_view', {
+            'message_id': 6, 'chat_id': 1, 'user_id': 1
+        }, to=1)
+        self.socketio.emit.assert_not_called()
+        self.socketio.start_background_task.assert_called_once()
+        self.coalescer.flush(1)
+        self.socketio.emit.assert_called_once_with('batch', [
+            {'event': 'update_view', 'data': {
+                'message_id': 5, 'chat_id': 1, 'user_ids': [1, 2, 3]
+            }},
+            {'event': 'edit_message', 'data': {'message_id': 5, 'text': 'b'}},
+            {'event': 'update_view', 'data': {
+                'message_id': 6, 'chat_id': 1, 'user_ids': [1]
+            }},
+        ], to=1)
+
+    def test_max_batch(self):
+        self.coalescer.max_batch = 2
+        self.coalescer.emit('message', {'id': 1}, to=1)
+        self.coalescer.emit('message', {'id': 2}, to=2)
+        self.coalescer.emit('message', {'id': 3}, to=1)
+        self.socketio.emit.assert_called_once_with('batch', [
+            {'event': 'message', 'data': {'id': 1}},
+            {'event': 'message', 'data': {'id': 3}},
+        ], to=1)
+        self.coalescer.flush_all()
+        self.socketio.emit.assert_called_with('message', {'id': 2}, to=2)
+
+    def test_skip_sid_flushes_room(self):
+        self.coalescer.emit('message', {'id': 1}, to=1)
+        self.coalescer.emit('remove_chat', {'chat_id': 1}, to=1, skip_sid='sid')
+        self.assertEqual(self.socketio.emit.call_args_list[0].args[0], 'message')
+        self.socketio.emit.assert_called_with(
+            'remove_chat', {'chat_id': 1}, to=1, skip_sid='sid'
+        )
+
+
+class JobRunnerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.socketio = MagicMock()
+        self.runner = JobRunner(self.socketio)
+        self.runner.app = app
+        self.runner.retry_backoff = 0
+        self.calls = []
+
+        @self.runner.task()
+        def append(value, *, times=1):
+            self.calls.extend([value] * times)
+
+        @self.runner.task('fail')
+        def fail():
+            self.calls.append('fail')
+            raise RuntimeError
+
+    def test_run(self):
+        self.runner.enqueue('append', 'a', times=2)
+        self.runner.enqueue('append', 'b')
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.runner.queue.sizes()['ready'], 2)
+        self.assertEqual(self.runner.run_pending(), 2)
+        self.assertEqual(self.calls, ['a', 'a', 'b'])
+        self.assertEqual(self.runner.queue.sizes(), {
+            'ready': 0, 'delayed': 0, 'processing': 0, 'dead': 0
+        })
+        self.socketio.start_background_task.assert_not_called()
+
+    def test_retries(self):
+        self.runner.max_retries = 2
+        self.runner.enqueue('fail')
+        self.assertEqual(self.runner.run_pending(), 3)
+        self.assertEqual(self.calls, ['fail'] * 3)
+        self.assertEqual(self.runner.stats, {'succeeded': 0, 'retried': 2, 'failed': 1})
+        self.assertEqual(self.runner.queue.sizes()['dead'], 1)
+
+    def test_delay(self):
+        self.runner.enqueue('append', 'a', delay=60)
+        self.assertEqual(self.runner.run_pending(), 0)
+        self.assertEqual(self.runner.queue.sizes()['delayed'], 1)
+
+    def test_unknown_job(self):
+        with self.assertRaises(ValueError):
+            self.runner.enqueue('unknown')
+
+    def test_workers_started(self):
+        self.runner.workers = 2
+        self.runner.enqueue('append', 'a')
+        self.runner.enqueue('append', 'b')
+        self.assertEqual(self.socketio.start_background_task.call_count, 2)
+
+    def test_recover(self):
+        queue = MemoryJobQueue()
+        queue.push('job')
+        self.assertEqual(queue.pop(), 'job')
+        self.assertIsNone(queue.pop())
+        self.assertEqual(queue.recover(), 1)
+        self.assertEqual(queue.pop(), 'job')